@@ -12,10 +12,79 @@ class Settings:
     SUPABASE_KEY = os.getenv("SUPABASE_KEY")
     SUPABASE_DB_URL = os.getenv("SUPABASE_DB_URL")
     
+    # Direct Postgres (핫패스 쿼리용 asyncpg 커넥션 풀)
+    USE_DIRECT_DB = os.getenv("USE_DIRECT_DB", "false").lower() == "true"
+    DB_POOL_MIN_SIZE = int(os.getenv("DB_POOL_MIN_SIZE", 1))
+    DB_POOL_MAX_SIZE = int(os.getenv("DB_POOL_MAX_SIZE", 10))
+    
+    # Write-behind (rag_log/diagnosis insert를 응답 이후 백그라운드에서 기록)
+    WRITE_BEHIND_ENABLED = os.getenv("WRITE_BEHIND_ENABLED", "false").lower() == "true"
+    WRITE_BEHIND_MAX_QUEUE = int(os.getenv("WRITE_BEHIND_MAX_QUEUE", 1000))
+    WRITE_BEHIND_BATCH_SIZE = int(os.getenv("WRITE_BEHIND_BATCH_SIZE", 50))
+    WRITE_BEHIND_FLUSH_INTERVAL = float(os.getenv("WRITE_BEHIND_FLUSH_INTERVAL", 1.0))
+    # 재시도가 모두 실패한 diagnosis 행을 보관할 디렉토리 (다음 시작 시 재기록), 큐가 가득 찼을 때 최대 대기 시간(초)
+    WRITE_BEHIND_SPILL_DIR = os.getenv("WRITE_BEHIND_SPILL_DIR", "data/write_behind_spill")
+    WRITE_BEHIND_SUBMIT_TIMEOUT = float(os.getenv("WRITE_BEHIND_SUBMIT_TIMEOUT", 2.0))
+    
+    # 사전 판정 fast path (정상 패턴만 매칭되면 LLM 호출 없이 템플릿 진단, 정상 참조 패턴이 준비될 때까지 기본 비활성화)
+    FAST_PATH_ENABLED = os.getenv("FAST_PATH_ENABLED", "false").lower() == "true"
+    FAST_PATH_MIN_SIMILARITY = float(os.getenv("FAST_PATH_MIN_SIMILARITY", 85.0))
+    FAST_PATH_MAX_OUTLIERS = int(os.getenv("FAST_PATH_MAX_OUTLIERS", 5))
+    FAST_PATH_MIN_SCORE = float(os.getenv("FAST_PATH_MIN_SCORE", 0.8))
+    
+    # /diagnosis 결과 캐시 (임베딩이 그대로면 최근 진단 재사용, 0이면 비활성화)
+    DIAGNOSIS_CACHE_TTL = float(os.getenv("DIAGNOSIS_CACHE_TTL", 60))
+    
+    # Chat 세션 캐시 (진단 컨텍스트 + 대화 기록)
+    CHAT_SESSION_MAX = int(os.getenv("CHAT_SESSION_MAX", 256))
+    CHAT_SESSION_TTL = float(os.getenv("CHAT_SESSION_TTL", 1800))
+    CHAT_HISTORY_MAX_MESSAGES = int(os.getenv("CHAT_HISTORY_MAX_MESSAGES", 20))
+    CHAT_HISTORY_MAX_CHARS = int(os.getenv("CHAT_HISTORY_MAX_CHARS", 8000))
+    
     # Chronos
     CHRONOS_MODEL = os.getenv("CHRONOS_MODEL", "amazon/chronos-bolt-tiny")
     DEVICE = os.getenv("DEVICE", "cpu")
     
+    # 센서 샘플링 주파수(Hz)와 주파수/보행 특징 기반 사전 필터 (명확히 정상이면 Chronos 임베딩 생략)
+    SENSOR_SAMPLING_RATE = float(os.getenv("SENSOR_SAMPLING_RATE", 100))
+    PREFILTER_ENABLED = os.getenv("PREFILTER_ENABLED", "false").lower() == "true"
+    
+    # 원본 센서 데이터 로컬 아카이브 (float32 memmap, 빈 값이면 비활성화)
+    SESSION_ARCHIVE_DIR = os.getenv("SESSION_ARCHIVE_DIR", "data/session_archive")
+    
+    # RAG 검색 백엔드: faiss(프로세스 메모리) | pgvector(DB RPC)
+    RETRIEVAL_BACKEND = os.getenv("RETRIEVAL_BACKEND", "faiss")
+    
+    # 채널별 후보 수, 매칭 임계값(%)과 pattern_stats 범위 재정렬 (HYBRID_ALPHA: 임베딩 유사도 가중치)
+    RAG_CANDIDATE_K = int(os.getenv("RAG_CANDIDATE_K", 3))
+    RAG_MATCH_THRESHOLD = float(os.getenv("RAG_MATCH_THRESHOLD", 50.0))
+    HYBRID_RERANK_ENABLED = os.getenv("HYBRID_RERANK_ENABLED", "true").lower() == "true"
+    HYBRID_ALPHA = float(os.getenv("HYBRID_ALPHA", 0.7))
+    
+    # 진단 시스템 프롬프트 최대 토큰 수 (초과분은 유사도 낮은 상태부터 생략)
+    PROMPT_TOKEN_BUDGET = int(os.getenv("PROMPT_TOKEN_BUDGET", 1500))
+    
+    # 엔드포인트별 동시 실행 한도/대기열 크기 (초과 시 503, 0이면 제한 없음)와 대기 최대 시간(초)
+    UPLOAD_MAX_CONCURRENCY = int(os.getenv("UPLOAD_MAX_CONCURRENCY", 2))
+    UPLOAD_MAX_QUEUE = int(os.getenv("UPLOAD_MAX_QUEUE", 8))
+    DIAGNOSIS_MAX_CONCURRENCY = int(os.getenv("DIAGNOSIS_MAX_CONCURRENCY", 4))
+    DIAGNOSIS_MAX_QUEUE = int(os.getenv("DIAGNOSIS_MAX_QUEUE", 16))
+    ADMISSION_QUEUE_TIMEOUT = float(os.getenv("ADMISSION_QUEUE_TIMEOUT", 10.0))
+    
+    # /diagnosis 사용자(user_id, 없으면 클라이언트 IP)별 토큰 버킷 (초과 시 429)
+    USER_RATE_LIMIT_ENABLED = os.getenv("USER_RATE_LIMIT_ENABLED", "false").lower() == "true"
+    USER_RATE_LIMIT_PER_MINUTE = float(os.getenv("USER_RATE_LIMIT_PER_MINUTE", 10))
+    USER_RATE_LIMIT_BURST = int(os.getenv("USER_RATE_LIMIT_BURST", 5))
+    
+    # 요청 프로파일링 (PROFILING_ENABLED면 SAMPLE_RATE 비율로 샘플링, ALLOW_HEADER면 X-Profile: 1 요청도 프로파일링)
+    # PROFILING_MODE: sampling(collapsed stack, 전체 스레드) | cprofile(.prof, 이벤트 루프 스레드만) | timings(구간 타이밍만)
+    PROFILING_ENABLED = os.getenv("PROFILING_ENABLED", "false").lower() == "true"
+    PROFILING_ALLOW_HEADER = os.getenv("PROFILING_ALLOW_HEADER", "false").lower() == "true"
+    PROFILING_SAMPLE_RATE = float(os.getenv("PROFILING_SAMPLE_RATE", 0.01))
+    PROFILING_MODE = os.getenv("PROFILING_MODE", "sampling")
+    PROFILING_TORCH = os.getenv("PROFILING_TORCH", "true").lower() == "true"
+    PROFILING_DIR = os.getenv("PROFILING_DIR", "data/profiles")
+    
     # Server
     HOST = os.getenv("HOST", "0.0.0.0")
     PORT = int(os.getenv("PORT", 8000))
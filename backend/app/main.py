@@ -1,11 +1,16 @@
-from fastapi import FastAPI, UploadFile, File, HTTPException
+from fastapi import FastAPI, UploadFile, File, HTTPException, Query, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, StreamingResponse
 from langserve import add_routes
+import asyncio
 import pandas as pd
 import numpy as np
 import io
+import json
+import uuid
+import base64
 import logging
-from typing import Dict, List
+from typing import Dict, List, Optional, Tuple
 from datetime import datetime
 
 # 로깅 설정
@@ -13,12 +18,22 @@ logging.basicConfig(level=logging.DEBUG)
 logger = logging.getLogger(__name__)
 
 from app.config import settings
-from app.models.schemas import UploadResponse, DiagnosisRequest, DiagnosisResponse, ChannelDiagnosis
+from app.models.schemas import UploadResponse, DiagnosisRequest, DiagnosisResponse, ChannelDiagnosis, ChatRequest, ChatResponse
 from app.services.csv_processor import CSVProcessor
-from app.services.chronos_embedder import ChronosEmbedder
+from app.services.chronos_embedder import ChronosEmbedder, CHANNELS
+from app.services.feature_extractor import GaitFeatureExtractor
 from app.services.rag_service import RAGService
 from app.services.diagnosis_chain import DiagnosisChain
-from app.utils.db_client import get_supabase_client
+from app.services.chat_session import ChatSessionCache
+from app.services.prescreener import DiagnosisPrescreener
+from app.utils.db_client import get_supabase_client, get_active_model_name
+from app.utils.pg_pool import get_postgres_pool
+from app.utils.write_behind import WriteBehindQueue, make_table_writer
+from app.utils.request_coalescing import SingleFlight, TTLResultCache
+from app.utils.vector_codec import decode_vector, encode_vector
+from app.utils.session_archive import SessionArchive
+from app.utils.profiling import RequestProfiler, ProfilingMiddleware, profile_section
+from app.utils.admission import AdmissionLimiter, AdmissionRejected, TokenBucketLimiter
 
 # FastAPI 앱 초기화
 app = FastAPI(
@@ -34,26 +49,122 @@ app.add_middleware(
     allow_origins=["*"],
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "X-Total-Count", "X-Profile-Id"],
 )
 
 # 서비스 초기화
 try:
     supabase = get_supabase_client()
-    embedder = ChronosEmbedder(settings.CHRONOS_MODEL, settings.DEVICE)
-    rag_service = RAGService(supabase)
-    diagnosis_chain = DiagnosisChain(settings.OPENAI_API_KEY)
+    # DB에 활성화된 임베딩 버전이 있으면 그 모델을 사용 (재임베딩 후 원자적 전환)
+    embedder = ChronosEmbedder(get_active_model_name(supabase), settings.DEVICE)
+    feature_extractor = GaitFeatureExtractor(settings.SENSOR_SAMPLING_RATE)
+    session_archive = SessionArchive(settings.SESSION_ARCHIVE_DIR) if settings.SESSION_ARCHIVE_DIR else None
+    rag_service = RAGService(supabase, model_version=embedder.model_version)
+    if rag_service.knowledge_count() == 0:
+        # 버전 태그가 없는 기존 행이 검색에서 빠지면 모든 진단이 실패하므로 시작하지 않음
+        raise RuntimeError(
+            f"No diagnosis knowledge for embedding version {embedder.model_version}. "
+            "Seed the knowledge base or tag legacy rows with `python -m app.services.reembedding_job --tag-legacy`."
+        )
+    diagnosis_chain = DiagnosisChain(settings.OPENAI_API_KEY, token_budget=settings.PROMPT_TOKEN_BUDGET)
+    prescreener = DiagnosisPrescreener(
+        min_similarity=settings.FAST_PATH_MIN_SIMILARITY,
+        max_outlier_count=settings.FAST_PATH_MAX_OUTLIERS,
+        min_score=settings.FAST_PATH_MIN_SCORE,
+    )
+    pg_pool = get_postgres_pool()  # USE_DIRECT_DB=true 일 때만 생성
+    write_queue = None  # startup 이벤트에서 생성 (이벤트 루프 필요)
+    diagnosis_flight = SingleFlight()  # 같은 요청의 동시 진단을 하나로 합침
+    diagnosis_cache = TTLResultCache(ttl_seconds=settings.DIAGNOSIS_CACHE_TTL)
+    chat_sessions = ChatSessionCache(
+        max_sessions=settings.CHAT_SESSION_MAX,
+        ttl_seconds=settings.CHAT_SESSION_TTL,
+        max_messages=settings.CHAT_HISTORY_MAX_MESSAGES,
+        max_chars=settings.CHAT_HISTORY_MAX_CHARS,
+    )
+    # 연산이 무거운 엔드포인트의 동시 실행/대기열 제한 (MAX_CONCURRENCY=0이면 비활성화)
+    upload_limiter = AdmissionLimiter(
+        "upload_csv", settings.UPLOAD_MAX_CONCURRENCY, settings.UPLOAD_MAX_QUEUE, settings.ADMISSION_QUEUE_TIMEOUT
+    ) if settings.UPLOAD_MAX_CONCURRENCY > 0 else None
+    diagnosis_limiter = AdmissionLimiter(
+        "diagnosis", settings.DIAGNOSIS_MAX_CONCURRENCY, settings.DIAGNOSIS_MAX_QUEUE, settings.ADMISSION_QUEUE_TIMEOUT
+    ) if settings.DIAGNOSIS_MAX_CONCURRENCY > 0 else None
+    user_rate_limiter = TokenBucketLimiter(
+        settings.USER_RATE_LIMIT_PER_MINUTE, settings.USER_RATE_LIMIT_BURST
+    ) if settings.USER_RATE_LIMIT_ENABLED else None
+    profiler = None
+    if settings.PROFILING_ENABLED or settings.PROFILING_ALLOW_HEADER:
+        profiler = RequestProfiler(
+            settings.PROFILING_DIR,
+            sample_rate=settings.PROFILING_SAMPLE_RATE if settings.PROFILING_ENABLED else 0.0,
+            mode=settings.PROFILING_MODE,
+            torch_enabled=settings.PROFILING_TORCH,
+        )
     logger.info("Services initialized successfully")
 except Exception as e:
     logger.error(f"Error initializing services: {str(e)}")
     raise
 
+@app.on_event("startup")
+async def startup():
+    global write_queue
+    if pg_pool is not None:
+        await pg_pool.connect()
+    if settings.WRITE_BEHIND_ENABLED:
+        write_queue = WriteBehindQueue(
+            make_table_writer(supabase, pg_pool),
+            max_size=settings.WRITE_BEHIND_MAX_QUEUE,
+            batch_size=settings.WRITE_BEHIND_BATCH_SIZE,
+            flush_interval=settings.WRITE_BEHIND_FLUSH_INTERVAL,
+            spill_dir=settings.WRITE_BEHIND_SPILL_DIR or None,
+        )
+        write_queue.start()
+
+@app.on_event("shutdown")
+async def shutdown():
+    # 대기 중인 로그/진단 행을 먼저 flush한 뒤 커넥션 풀 종료
+    if write_queue is not None:
+        await write_queue.close()
+    if pg_pool is not None:
+        await pg_pool.close()
+
+@app.exception_handler(AdmissionRejected)
+async def admission_rejected_handler(request: Request, exc: AdmissionRejected):
+    return JSONResponse(
+        status_code=exc.status_code,
+        content={"detail": exc.detail},
+        headers={"Retry-After": str(max(1, int(np.ceil(exc.retry_after))))}
+    )
+
+async def _run_admitted(limiter: Optional[AdmissionLimiter], fn):
+    """동시 실행 슬롯을 얻은 뒤 실행 (한도 초과 시 AdmissionRejected)"""
+    if limiter is None:
+        return await fn()
+    async with limiter.slot():
+        return await fn()
+
+# 프로파일링 대상 엔드포인트
+# 프로파일러가 켜진 경우에만 등록 (비활성화 시 요청마다 미들웨어를 거치지 않음)
+if profiler is not None:
+    app.add_middleware(
+        ProfilingMiddleware,
+        profiler=profiler,
+        paths={"/upload_csv", "/diagnosis"},
+        allow_header=settings.PROFILING_ALLOW_HEADER,
+    )
+
 @app.post("/upload_csv", response_model=UploadResponse)
 async def upload_csv(file: UploadFile = File(...)):
+    """CSV 파일 업로드 및 처리 (동시 처리 한도 초과 시 503)"""
+    return await _run_admitted(upload_limiter, lambda: _process_upload(file))
+
+async def _process_upload(file: UploadFile) -> UploadResponse:
     """CSV 파일 업로드 및 처리"""
     try:
         # CSV 읽기
+        # CPU/DB 작업은 스레드에서 실행 (이벤트 루프를 막으면 동시 실행 제한과 빠른 거절이 동작하지 않음)
         contents = await file.read()
-        df = pd.read_csv(io.StringIO(contents.decode('utf-8')))
+        df = await asyncio.to_thread(lambda: pd.read_csv(io.StringIO(contents.decode('utf-8'))))
         
         # 유효성 검증
         is_valid, message = CSVProcessor.validate_sensor_data(df)
@@ -61,40 +172,71 @@ async def upload_csv(file: UploadFile = File(...)):
             raise HTTPException(status_code=400, detail=message)
             
         # 전처리
-        df = CSVProcessor.preprocess_data(df)
+        df = await asyncio.to_thread(CSVProcessor.preprocess_data, df)
+        
+        # 주파수/보행 주기 특징 추출 (6축 일괄)
+        gait_features = await asyncio.to_thread(feature_extractor.extract, df)
+        skip_embedding = settings.PREFILTER_ENABLED and GaitFeatureExtractor.is_clearly_normal(gait_features)
+        gait_features["prefiltered_normal"] = skip_embedding
         
         # DB에 원본 저장
-        sensor_data = supabase.table('sensor_data').insert({
+        sensor_data = await asyncio.to_thread(lambda: supabase.table('sensor_data').insert({
             "filename": file.filename,
             "row_count": len(df),
             "channel_count": 6,
             "raw_data": df.to_dict('records'),
+            "gait_features": gait_features,
             "status": "processing"
-        }).execute()
+        }).execute())
         
         sensor_data_id = sensor_data.data[0]['id']
         
-        # 임베딩 생성
-        embeddings = embedder.process_sensor_data(df)
-        
-        # 임베딩 DB 저장
-        for channel, data in embeddings.items():
-            supabase.table('embeddings').insert({
-                "sensor_data_id": sensor_data_id,
-                "channel_name": channel,
-                "embedding": data["embedding"].tolist(),
-                "mean_value": data["stats"]["mean"],
-                "variance": data["stats"]["variance"],
-                "peak_value": data["stats"]["peak"],
-                "min_value": data["stats"]["min"],
-                "outlier_count": data["stats"]["outlier_count"],
-                "zero_crossing_rate": data["stats"]["zero_crossing_rate"]
-            }).execute()
+        # 로컬 아카이브에 채널별 float32로 저장 (재임베딩/구간 조회 시 JSONB 역직렬화 불필요)
+        if session_archive is not None:
+            try:
+                await asyncio.to_thread(session_archive.write, sensor_data_id, df)
+            except Exception as e:
+                logger.warning(f"Failed to archive sensor data {sensor_data_id}: {str(e)}")
+        
+        # 임베딩 생성 (명확히 정상인 세션은 Chronos를 건너뛰고 통계만 저장)
+        if skip_embedding:
+            channels = [channel for channel in CHANNELS if channel in df.columns]
+            channel_stats = ChronosEmbedder.compute_stats(df[channels].to_numpy(dtype=np.float64).T)
+            embeddings = {
+                channel: {"embedding": None, "stats": stats}
+                for channel, stats in zip(channels, channel_stats)
+            }
+        else:
+            embeddings = await asyncio.to_thread(embedder.process_sensor_data, df)
+        
+        # 임베딩 DB 저장 (6개 채널 일괄 insert)
+        if pg_pool is not None:
+            await pg_pool.insert_embeddings(
+                sensor_data_id, embeddings, embedder.model_version, embedder.pooling_method
+            )
+        else:
+            embedding_rows = [
+                {
+                    "sensor_data_id": sensor_data_id,
+                    "channel_name": channel,
+                    "embedding": encode_vector(data["embedding"]) if data["embedding"] is not None else None,
+                    "mean_value": data["stats"]["mean"],
+                    "variance": data["stats"]["variance"],
+                    "peak_value": data["stats"]["peak"],
+                    "min_value": data["stats"]["min"],
+                    "outlier_count": data["stats"]["outlier_count"],
+                    "zero_crossing_rate": data["stats"]["zero_crossing_rate"],
+                    "model_version": embedder.model_version,
+                    "pooling_method": embedder.pooling_method
+                }
+                for channel, data in embeddings.items()
+            ]
+            await asyncio.to_thread(lambda: supabase.table('embeddings').insert(embedding_rows).execute())
             
         # 상태 업데이트
-        supabase.table('sensor_data').update({
+        await asyncio.to_thread(lambda: supabase.table('sensor_data').update({
             "status": "completed"
-        }).eq('id', sensor_data_id).execute()
+        }).eq('id', sensor_data_id).execute())
         
         return UploadResponse(
             sensor_data_id=sensor_data_id,
@@ -108,39 +250,55 @@ async def upload_csv(file: UploadFile = File(...)):
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/diagnosis", response_model=DiagnosisResponse)
-async def create_diagnosis(request: DiagnosisRequest):
+async def create_diagnosis(request: DiagnosisRequest, http_request: Request):
+    """진단 생성 (같은 sensor_data_id/user_id의 동시 요청은 하나의 계산과 실행 슬롯을 공유)"""
+    if user_rate_limiter is not None:
+        # user_id가 없으면(현재 프론트엔드) 모든 클라이언트가 한 버킷을 공유하지 않도록 클라이언트 IP 기준
+        client_host = http_request.client.host if http_request.client else "unknown"
+        user_rate_limiter.acquire(f"user:{request.user_id}" if request.user_id else f"ip:{client_host}")
+    key = (request.sensor_data_id, request.user_id)
+    return await diagnosis_flight.do(key, lambda: _run_admitted(diagnosis_limiter, lambda: _run_diagnosis(request)))
+
+async def _run_diagnosis(request: DiagnosisRequest) -> DiagnosisResponse:
     """진단 생성"""
     try:
         logger.debug(f"Processing diagnosis request for sensor_data_id: {request.sensor_data_id}")
         
         # 1. 센서 데이터의 임베딩 조회
-        embeddings_data = supabase.table('embeddings').select("*").eq(
-            'sensor_data_id', request.sensor_data_id
-        ).execute()
+        if pg_pool is not None:
+            embedding_rows = await pg_pool.fetch_embeddings(request.sensor_data_id, embedder.model_version)
+        else:
+            embedding_rows = (await asyncio.to_thread(
+                lambda: supabase.table('embeddings').select("*, sensor_data(gait_features)").eq(
+                    'sensor_data_id', request.sensor_data_id
+                ).eq('model_version', embedder.model_version).execute()
+            )).data
         
-        logger.debug(f"Found {len(embeddings_data.data)} embeddings")
+        logger.debug(f"Found {len(embedding_rows)} embeddings")
 
-        if not embeddings_data.data:
+        if not embedding_rows:
             raise HTTPException(
                 status_code=404,
                 detail=f"No embeddings found for sensor_data_id: {request.sensor_data_id}"
             )
         
+        # 임베딩이 바뀌지 않았으면 최근 진단 결과 재사용
+        cache_key = (request.sensor_data_id, request.user_id)
+        fingerprint = tuple(sorted(str(emb['id']) for emb in embedding_rows))
+        cached_response = diagnosis_cache.get(cache_key, fingerprint)
+        if cached_response is not None:
+            logger.debug(f"Returning cached diagnosis for sensor_data_id: {request.sensor_data_id}")
+            return cached_response
+        
         # 2. 임베딩과 통계 데이터 구성
         sensor_embeddings = {}
         sensor_stats = {}
         
-        for emb in embeddings_data.data:
+        for emb in embedding_rows:
             channel = emb['channel_name']
-            # 문자열 임베딩을 numpy 배열로 변환
-            if isinstance(emb['embedding'], str):
-                embedding_str = emb['embedding'].strip('[]')
-                embedding_list = [float(x) for x in embedding_str.split(',')]
-                embedding_vector = np.array(embedding_list, dtype=np.float32)
-            else:
-                embedding_vector = np.array(emb['embedding'], dtype=np.float32)
-                
-            sensor_embeddings[channel] = embedding_vector
+            # pgvector 값을 numpy 배열로 변환 (사전 필터로 임베딩을 건너뛴 채널은 통계만 사용)
+            if emb['embedding'] is not None:
+                sensor_embeddings[channel] = decode_vector(emb['embedding'])
             sensor_stats[channel] = {
                 'mean': emb['mean_value'],
                 'variance': emb['variance'],
@@ -149,48 +307,82 @@ async def create_diagnosis(request: DiagnosisRequest):
                 'zero_crossing_rate': emb['zero_crossing_rate']
             }
             
+        first_row = embedding_rows[0]
+        gait_features = first_row.get('gait_features') or (first_row.get('sensor_data') or {}).get('gait_features')
         logger.debug(f"Processed embeddings for channels: {list(sensor_embeddings.keys())}")
         
         # 3. RAG를 통한 진단 패턴 검색
-        matched_diagnoses = rag_service.search_diagnosis(
+        matched_diagnoses = await asyncio.to_thread(
+            rag_service.search_diagnosis,
             sensor_embeddings, 
-            threshold=10.0
+            threshold=settings.RAG_MATCH_THRESHOLD,
+            sensor_stats=sensor_stats,
+            k=settings.RAG_CANDIDATE_K
         )
         
         logger.debug(f"Found {len(matched_diagnoses)} matching diagnoses")
 
-        if not matched_diagnoses:
+        # 명확히 정상인 세션은 LLM 없이 판정 (fast path)
+        screening = None
+        if settings.FAST_PATH_ENABLED:
+            screening = prescreener.screen(matched_diagnoses, sensor_stats, gait_features)
+        
+        if not matched_diagnoses and sensor_embeddings and screening is None:
             raise HTTPException(
                 status_code=404,
                 detail="No matching diagnosis patterns found"
             )
         
-        # 4. 검색 결과 로깅
-        if embeddings_data.data:
+        # 4. 검색 결과 로깅 (write-behind 사용 시 응답 경로 밖에서 기록)
+        if embedding_rows and matched_diagnoses:
             try:
-                rag_service.log_search_results(
-                    embeddings_data.data[0]['id'],
-                    matched_diagnoses
-                )
+                if write_queue is not None:
+                    await write_queue.submit(
+                        'rag_log',
+                        rag_service.build_log_row(
+                            embedding_rows[0]['id'], matched_diagnoses, settings.RAG_MATCH_THRESHOLD
+                        )
+                    )
+                elif pg_pool is not None:
+                    await pg_pool.insert_rag_log(
+                        embedding_rows[0]['id'], matched_diagnoses, settings.RAG_MATCH_THRESHOLD
+                    )
+                else:
+                    await asyncio.to_thread(
+                        rag_service.log_search_results,
+                        embedding_rows[0]['id'],
+                        matched_diagnoses,
+                        settings.RAG_MATCH_THRESHOLD
+                    )
             except Exception as e:
                 print(f"Warning: Failed to log search results: {str(e)}")
         
-        # 각 축별 유사 임베딩 검색
-        similar_channels = []
-        for emb in embeddings_data.data:
-            channel = emb['channel_name']
-            similar = rag_service.search_similar(
-                emb['embedding'],  # 문자열 형태의 임베딩을 직접 전달
-                threshold=80.0
-            )
-            if similar:
-                similar_channels.extend(similar)
-                
-        # 시스템 프롬프트 생성
-        system_prompt = diagnosis_chain.create_system_prompt(similar_channels, sensor_stats)
-        
-        # 6. GPT를 통한 종합 진단 생성
-        diagnosis = diagnosis_chain.generate_diagnosis(system_prompt)
+        if screening is not None:
+            # 5-6. 템플릿 진단 (프롬프트는 후속 대화 컨텍스트용으로만 생성)
+            logger.debug(f"Fast path taken ({screening['reason']}, score {screening['score']:.2f})")
+            system_prompt, prompt_tokens = diagnosis_chain.build_system_prompt(matched_diagnoses, sensor_stats, gait_features)
+            diagnosis = diagnosis_chain.generate_templated_diagnosis(screening, matched_diagnoses, sensor_stats)
+            diagnosis_path = "fast_path"
+        else:
+            # 5. 각 축별 유사 임베딩 검색
+            similar_channels = []
+            for channel, embedding_vector in sensor_embeddings.items():
+                similar = await asyncio.to_thread(
+                    rag_service.search_similar,
+                    embedding_vector,  # 이미 디코딩된 벡터 재사용
+                    threshold=80.0
+                )
+                if similar:
+                    similar_channels.extend(similar)
+                    
+            # 시스템 프롬프트 생성 (중복 상태 병합, PROMPT_TOKEN_BUDGET 이내)
+            system_prompt, prompt_tokens = diagnosis_chain.build_system_prompt(similar_channels, sensor_stats, gait_features)
+            logger.debug(f"System prompt: {prompt_tokens} tokens from {len(similar_channels)} similar patterns")
+            
+            # 6. GPT를 통한 종합 진단 생성
+            with profile_section("llm_generate", prompt_tokens=prompt_tokens):
+                diagnosis = await asyncio.to_thread(diagnosis_chain.generate_diagnosis, system_prompt)
+            diagnosis_path = "llm"
         
         # 7. 각 채널별 진단 구성
         channel_diagnoses = []
@@ -205,7 +397,7 @@ async def create_diagnosis(request: DiagnosisRequest):
         
         # 8. 진단 결과 DB 저장
         try:
-            diagnosis_result = supabase.table('diagnosis').insert({
+            diagnosis_row = {
                 "sensor_data_id": request.sensor_data_id,
                 "user_id": request.user_id,
                 "overall_diagnosis": diagnosis["overall_diagnosis"],
@@ -213,6 +405,7 @@ async def create_diagnosis(request: DiagnosisRequest):
                 "recommendations": diagnosis["recommendations"],
                 "used_embeddings": matched_diagnoses,
                 "system_prompt": system_prompt,
+                "diagnosis_path": diagnosis_path,
                 
                 # 각 축별 진단 저장
                 "accx_diagnosis": next((d['diagnosis_text'] for d in matched_diagnoses if d['channel'] == 'AccX'), None),
@@ -221,7 +414,24 @@ async def create_diagnosis(request: DiagnosisRequest):
                 "gyrx_diagnosis": next((d['diagnosis_text'] for d in matched_diagnoses if d['channel'] == 'GyrX'), None),
                 "gyry_diagnosis": next((d['diagnosis_text'] for d in matched_diagnoses if d['channel'] == 'GyrY'), None),
                 "gyrz_diagnosis": next((d['diagnosis_text'] for d in matched_diagnoses if d['channel'] == 'GyrZ'), None),
-            }).execute()
+            }
+            if write_queue is not None:
+                # id/created_at을 미리 생성해서 insert를 백그라운드로 미룸
+                diagnosis_row["id"] = str(uuid.uuid4())
+                diagnosis_row["created_at"] = datetime.utcnow()
+                queued = await write_queue.submit(
+                    'diagnosis', diagnosis_row, block=True, timeout=settings.WRITE_BEHIND_SUBMIT_TIMEOUT
+                )
+                if not queued:
+                    # DB 장애로 큐가 밀려 있으면 응답을 지연시키지 않고 id 없이 반환
+                    raise RuntimeError("write-behind queue is full")
+                saved_diagnosis = {"id": diagnosis_row["id"], "created_at": diagnosis_row["created_at"]}
+            elif pg_pool is not None:
+                saved_diagnosis = await pg_pool.insert_diagnosis(diagnosis_row)
+            else:
+                saved_diagnosis = (await asyncio.to_thread(
+                    lambda: supabase.table('diagnosis').insert(diagnosis_row).execute()
+                )).data[0]
         except Exception as e:
             print(f"Warning: Failed to save diagnosis result: {str(e)}")
             # 저장 실패해도 응답은 반환
@@ -232,18 +442,28 @@ async def create_diagnosis(request: DiagnosisRequest):
                 overall_diagnosis=diagnosis["overall_diagnosis"],
                 severity_level=diagnosis["severity_level"],
                 recommendations=diagnosis["recommendations"],
+                diagnosis_path=diagnosis_path,
+                prompt_tokens=prompt_tokens,
                 created_at=None
             )
         
-        return DiagnosisResponse(
-            diagnosis_id=diagnosis_result.data[0]['id'],
+        # 후속 대화용 컨텍스트 캐시 (chat에서 DB 재조회/프롬프트 재생성 방지)
+        chat_sessions.put(saved_diagnosis['id'], system_prompt, diagnosis["overall_diagnosis"])
+        
+        response = DiagnosisResponse(
+            diagnosis_id=saved_diagnosis['id'],
             sensor_data_id=request.sensor_data_id,
             channel_diagnoses=channel_diagnoses,
             overall_diagnosis=diagnosis["overall_diagnosis"],
             severity_level=diagnosis["severity_level"],
             recommendations=diagnosis["recommendations"],
-            created_at=diagnosis_result.data[0]['created_at']
+            diagnosis_path=diagnosis_path,
+            prompt_tokens=prompt_tokens,
+            created_at=saved_diagnosis['created_at']
         )
+        diagnosis_cache.put(cache_key, fingerprint, response)
+        
+        return response
         
     except HTTPException as he:
         raise he
@@ -254,19 +474,140 @@ async def create_diagnosis(request: DiagnosisRequest):
             detail=f"Internal server error: {str(e)}"
         )
 
+async def _save_chat_turn(request: ChatRequest, reply: str):
+    """대화 기록 저장 (실패해도 응답에는 영향 없음)"""
+    rows = [
+        {"diagnosis_id": request.diagnosis_id, "user_id": request.user_id, "role": "user", "content": request.message},
+        {"diagnosis_id": request.diagnosis_id, "user_id": request.user_id, "role": "assistant", "content": reply},
+    ]
+    try:
+        if write_queue is not None:
+            for row in rows:
+                await write_queue.submit('chat_log', row)
+        else:
+            await asyncio.to_thread(lambda: supabase.table('chat_log').insert(rows).execute())
+    except Exception as e:
+        logger.warning(f"Failed to save chat log: {str(e)}")
+
+@app.post("/chat", response_model=ChatResponse)
+async def chat(request: ChatRequest):
+    """진단 결과에 대한 후속 대화"""
+    try:
+        # 1. 캐시된 진단 컨텍스트 조회 (없을 때만 DB에서 로드)
+        session = chat_sessions.get(request.diagnosis_id)
+        if session is None:
+            result = await asyncio.to_thread(lambda: supabase.table('diagnosis').select(
+                "system_prompt, overall_diagnosis"
+            ).eq('id', request.diagnosis_id).execute())
+            
+            if not result.data:
+                raise HTTPException(
+                    status_code=404,
+                    detail=f"Diagnosis not found: {request.diagnosis_id}"
+                )
+            session = chat_sessions.put(
+                request.diagnosis_id,
+                result.data[0]['system_prompt'] or "",
+                result.data[0]['overall_diagnosis'] or ""
+            )
+        
+        messages = diagnosis_chain.build_chat_messages(session, request.message)
+        
+        # 2. 스트리밍 응답
+        if request.stream:
+            async def stream_reply():
+                chunks = []
+                async for chunk in diagnosis_chain.stream_chat(messages):
+                    chunks.append(chunk)
+                    yield chunk
+                reply = "".join(chunks)
+                session.add_turn(request.message, reply)
+                await _save_chat_turn(request, reply)
+            
+            return StreamingResponse(stream_reply(), media_type="text/plain; charset=utf-8")
+        
+        # 3. 일반 응답
+        reply = await diagnosis_chain.chat(messages)
+        session.add_turn(request.message, reply)
+        await _save_chat_turn(request, reply)
+        
+        return ChatResponse(diagnosis_id=request.diagnosis_id, response=reply)
+        
+    except HTTPException as he:
+        raise he
+    except Exception as e:
+        logger.error(f"Error in chat: {str(e)}")
+        raise HTTPException(
+            status_code=500,
+            detail=f"Internal server error: {str(e)}"
+        )
+
 @app.get("/health")
 async def health_check():
     return {"status": "healthy"}
 
+@app.get("/metrics/admission")
+async def admission_metrics():
+    """엔드포인트별 동시 실행/대기열 상태와 대기 시간(queue_wait_ms)"""
+    return {
+        "upload_csv": upload_limiter.metrics() if upload_limiter is not None else None,
+        "diagnosis": diagnosis_limiter.metrics() if diagnosis_limiter is not None else None,
+        "user_rate_limit": user_rate_limiter.metrics() if user_rate_limiter is not None else None
+    }
+
+def _encode_cursor(row: Dict) -> str:
+    """(upload_time, id) keyset 커서 인코딩"""
+    return base64.urlsafe_b64encode(json.dumps([row["upload_time"], row["id"]]).encode()).decode()
+
+def _decode_cursor(cursor: str) -> Tuple[str, str]:
+    """커서 디코딩 (PostgREST 필터에 그대로 들어가므로 timestamp/UUID로 파싱한 정규화 값만 반환)"""
+    upload_time, row_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    return datetime.fromisoformat(upload_time).isoformat(), str(uuid.UUID(row_id))
+
 @app.get("/sensor_data")
-async def get_sensor_data():
-    """업로드된 센서 데이터 목록 조회"""
+async def get_sensor_data(
+    response: Response,
+    limit: int = Query(10, ge=1, le=100),
+    cursor: Optional[str] = None,
+    status: Optional[str] = None,
+    user_id: Optional[str] = None,
+    include_count: bool = False
+):
+    """업로드된 센서 데이터 목록 조회 (필요한 컬럼만, upload_time/id keyset 페이지네이션)
+    
+    다음 페이지 커서는 X-Next-Cursor, 전체 건수(추정치)는 X-Total-Count 헤더로 반환
+    """
     try:
-        response = supabase.table('sensor_data').select("*").order('upload_time', desc=True).limit(10).execute()
+        # raw_data(JSONB)는 제외하고 목록에 필요한 컬럼만 조회
+        query = supabase.table('sensor_data').select(
+            "id, filename, upload_time, status, row_count",
+            count="estimated" if include_count else None
+        )
+        if status:
+            query = query.eq('status', status)
+        if user_id:
+            query = query.eq('user_id', user_id)
+        if cursor:
+            try:
+                upload_time, row_id = _decode_cursor(cursor)
+            except Exception:
+                raise HTTPException(status_code=400, detail="Invalid cursor")
+            query = query.or_(
+                f'upload_time.lt."{upload_time}",and(upload_time.eq."{upload_time}",id.lt.{row_id})'
+            )
+        
+        # limit + 1개를 조회해 다음 페이지 존재 여부 확인
+        result = query.order('upload_time', desc=True).order('id', desc=True).limit(limit + 1).execute()
+        rows = result.data[:limit]
+        
+        if len(result.data) > limit:
+            response.headers["X-Next-Cursor"] = _encode_cursor(rows[-1])
+        if include_count and result.count is not None:
+            response.headers["X-Total-Count"] = str(result.count)
         
         # 응답 데이터 가공
         sensor_data_list = []
-        for data in response.data:
+        for data in rows:
             sensor_data_list.append({
                 "id": data["id"],
                 "filename": data["filename"],
@@ -277,6 +618,8 @@ async def get_sensor_data():
             
         return sensor_data_list
         
+    except HTTPException as he:
+        raise he
     except Exception as e:
         logger.error(f"Error fetching sensor data: {str(e)}")
         raise HTTPException(
@@ -284,6 +627,26 @@ async def get_sensor_data():
             detail=f"Failed to fetch sensor data: {str(e)}"
         )
 
+@app.get("/sensor_data/{sensor_data_id}/channels/{channel}")
+async def get_channel_data(sensor_data_id: str, channel: str, start: int = 0, stop: Optional[int] = None, step: int = 1):
+    """아카이브된 원본 채널 구간 조회 (플롯/윈도우 분석용)"""
+    if session_archive is None:
+        raise HTTPException(status_code=404, detail="Session archive is disabled")
+    try:
+        if not session_archive.exists(sensor_data_id):
+            raise HTTPException(status_code=404, detail=f"No archived data for sensor_data_id: {sensor_data_id}")
+        values = session_archive.channel(sensor_data_id, channel, start, stop, max(step, 1))
+    except (KeyError, ValueError) as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    return {
+        "sensor_data_id": sensor_data_id,
+        "channel": channel,
+        "start": start,
+        "step": max(step, 1),
+        "values": values.tolist()
+    }
+
 # Uvicorn으로 서버 실행
 if __name__ == "__main__":
     import uvicorn
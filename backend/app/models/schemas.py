@@ -27,6 +27,8 @@ class DiagnosisResponse(BaseModel):
     overall_diagnosis: str
     severity_level: str
     recommendations: List[str]
+    diagnosis_path: str = "llm"  # llm | fast_path
+    prompt_tokens: Optional[int] = None  # 시스템 프롬프트 토큰 수
     created_at: datetime
 
 class ChatMessage(BaseModel):
@@ -37,3 +39,8 @@ class ChatRequest(BaseModel):
     diagnosis_id: str
     message: str
     user_id: Optional[str] = None
+    stream: bool = False
+
+class ChatResponse(BaseModel):
+    diagnosis_id: str
+    response: str
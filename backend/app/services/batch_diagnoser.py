@@ -0,0 +1,216 @@
+import argparse
+import glob
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional, Set
+
+import numpy as np
+import pandas as pd
+
+from app.config import settings
+from app.services.csv_processor import CSVProcessor
+from app.services.chronos_embedder import ChronosEmbedder, CHANNELS
+from app.services.rag_service import RAGService
+from app.utils.db_client import get_supabase_client, get_active_model_name
+
+SEVERITY_ORDER = {"normal": 0, "warning": 1, "critical": 2}
+
+
+def load_recording(path: str) -> Dict:
+    """CSV 읽기 + 검증 + 전처리 (프로세스 풀 워커에서 실행)"""
+    try:
+        df = pd.read_csv(path)
+        is_valid, message = CSVProcessor.validate_sensor_data(df)
+        if not is_valid:
+            return {"path": path, "error": message}
+
+        df = CSVProcessor.preprocess_data(df)
+        return {
+            "path": path,
+            "row_count": len(df),
+            "channels": {channel: df[channel].to_numpy(dtype=np.float64) for channel in CHANNELS}
+        }
+    except Exception as e:
+        return {"path": path, "error": str(e)}
+
+
+def expand_inputs(inputs: List[str]) -> List[str]:
+    """디렉토리/글롭 패턴을 CSV 파일 목록으로 확장"""
+    paths = []
+    for item in inputs:
+        if os.path.isdir(item):
+            paths.extend(glob.glob(os.path.join(item, "**", "*.csv"), recursive=True))
+        else:
+            paths.extend(glob.glob(item, recursive=True))
+    return sorted(set(os.path.abspath(path) for path in paths))
+
+
+class BatchDiagnoser:
+    """저장된 녹화 CSV들을 일괄 재진단 (파싱 병렬화 + 배치 임베딩 + RAG 검색)"""
+
+    def __init__(
+        self,
+        output: str,
+        output_format: str = "jsonl",
+        chunk_size: int = 256,
+        workers: Optional[int] = None,
+        threshold: float = settings.RAG_MATCH_THRESHOLD,
+    ):
+        self.output = Path(output)
+        self.output_format = output_format
+        self.chunk_size = chunk_size
+        self.workers = workers
+        self.threshold = threshold
+        supabase = get_supabase_client()
+        # 서버와 같은 활성 임베딩 버전으로 임베딩/검색
+        self.embedder = ChronosEmbedder(get_active_model_name(supabase), settings.DEVICE)
+        self.rag_service = RAGService(supabase, model_version=self.embedder.model_version)
+
+    def run(self, inputs: List[str]):
+        """입력 파일 전체 처리 (이미 완료된 파일은 건너뛰고 실패했던 파일은 재시도)"""
+        paths = expand_inputs(inputs)
+        done = self._completed_paths()
+        pending = [path for path in paths if path not in done]
+        print(f"Found {len(paths)} recordings, {len(done)} already processed, {len(pending)} pending")
+
+        if not pending:
+            return
+
+        chunks = [pending[i:i + self.chunk_size] for i in range(0, len(pending), self.chunk_size)]
+        processed = 0
+
+        with ProcessPoolExecutor(max_workers=self.workers) as executor:
+            # 다음 청크 파싱을 미리 제출해두고 현재 청크 임베딩과 겹치게 실행
+            next_futures = [executor.submit(load_recording, path) for path in chunks[0]]
+            for index in range(len(chunks)):
+                futures = next_futures
+                if index + 1 < len(chunks):
+                    next_futures = [executor.submit(load_recording, path) for path in chunks[index + 1]]
+
+                recordings = [future.result() for future in futures]
+                results = self._diagnose_chunk(recordings)
+                self._write_results(results)
+
+                processed += len(results)
+                print(f"Processed {processed}/{len(pending)} recordings")
+
+    def _diagnose_chunk(self, recordings: List[Dict]) -> List[Dict]:
+        """청크 내 모든 채널을 한 번에 임베딩한 뒤 녹화별로 RAG 검색"""
+        valid = [recording for recording in recordings if "error" not in recording]
+        series = [recording["channels"][channel] for recording in valid for channel in CHANNELS]
+        embeddings, stats = self.embedder.embed_batch(series) if series else ([], [])
+
+        results = []
+        offset = 0
+        for recording in recordings:
+            if "error" in recording:
+                results.append({"path": recording["path"], "status": "failed", "error": recording["error"]})
+                continue
+
+            sensor_embeddings = dict(zip(CHANNELS, embeddings[offset:offset + len(CHANNELS)]))
+            sensor_stats = dict(zip(CHANNELS, stats[offset:offset + len(CHANNELS)]))
+            offset += len(CHANNELS)
+
+            matched = self.rag_service.search_diagnosis(
+                sensor_embeddings, threshold=self.threshold, sensor_stats=sensor_stats, k=settings.RAG_CANDIDATE_K
+            )
+            severity = max(
+                (diag["severity"] for diag in matched),
+                key=lambda level: SEVERITY_ORDER.get(level, 0),
+                default="normal"
+            )
+            results.append({
+                "path": recording["path"],
+                "status": "completed",
+                "error": None,
+                "row_count": recording["row_count"],
+                "severity_level": severity,
+                "matched_diagnoses": [
+                    {key: diag[key] for key in ("channel", "condition_type", "diagnosis_text", "severity", "similarity")}
+                    for diag in matched
+                ],
+                "channel_stats": sensor_stats
+            })
+        return results
+
+    def _write_results(self, results: List[Dict]):
+        """청크 단위로 결과 기록 (중단 시 마지막으로 기록된 청크부터 재개)"""
+        if self.output_format == "parquet":
+            self.output.mkdir(parents=True, exist_ok=True)
+            df = pd.DataFrame([
+                {
+                    **result,
+                    "matched_diagnoses": json.dumps(result.get("matched_diagnoses", [])),
+                    "channel_stats": json.dumps(result.get("channel_stats", {}))
+                }
+                for result in results
+            ])
+            part = self.output / f"part-{len(list(self.output.glob('part-*.parquet'))):05d}.parquet"
+            tmp = part.with_suffix(".tmp")
+            df.to_parquet(tmp, index=False)
+            os.replace(tmp, part)  # 원자적으로 교체해 부분 기록 방지
+            return
+
+        self.output.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.output, "ab") as f:
+            # 중단으로 잘린 마지막 줄이 있으면 줄바꿈 후 이어쓰기
+            if f.tell() > 0:
+                with open(self.output, "rb") as existing:
+                    existing.seek(-1, os.SEEK_END)
+                    if existing.read(1) != b"\n":
+                        f.write(b"\n")
+            for result in results:
+                f.write((json.dumps(result, ensure_ascii=False) + "\n").encode("utf-8"))
+            f.flush()
+            os.fsync(f.fileno())
+
+    def _completed_paths(self) -> Set[str]:
+        """기존 출력에서 처리 완료된 파일 경로 수집 (실패 기록은 다음 실행에서 재시도, 같은 경로는 마지막 기록이 유효)"""
+        if self.output_format == "parquet":
+            if not self.output.is_dir():
+                return set()
+            done = set()
+            for part in self.output.glob("part-*.parquet"):
+                df = pd.read_parquet(part, columns=["path", "status"])
+                done.update(df.loc[df["status"] == "completed", "path"])
+            return done
+
+        if not self.output.exists():
+            return set()
+        done = set()
+        with open(self.output, encoding="utf-8", errors="replace") as f:
+            for line in f:
+                try:
+                    result = json.loads(line)
+                    if result["status"] == "completed":
+                        done.add(result["path"])
+                except (json.JSONDecodeError, KeyError):
+                    continue  # 중단 시 잘린 마지막 줄
+        return done
+
+
+def _parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Batch re-diagnosis of archived sensor recordings")
+    parser.add_argument("inputs", nargs="+", help="CSV 파일, 디렉토리 또는 글롭 패턴")
+    parser.add_argument("--output", required=True, help="JSONL 파일 경로 또는 Parquet 출력 디렉토리")
+    parser.add_argument("--format", choices=["jsonl", "parquet"], default="jsonl")
+    parser.add_argument("--chunk-size", type=int, default=256)
+    parser.add_argument("--workers", type=int, default=None, help="파싱 프로세스 수 (기본: CPU 코어 수)")
+    parser.add_argument("--threshold", type=float, default=settings.RAG_MATCH_THRESHOLD, help="RAG 유사도 임계값 (/diagnosis와 동일 기본값)")
+    return parser.parse_args()
+
+
+# 사용 예시
+if __name__ == "__main__":
+    args = _parse_args()
+    diagnoser = BatchDiagnoser(
+        args.output,
+        output_format=args.format,
+        chunk_size=args.chunk_size,
+        workers=args.workers,
+        threshold=args.threshold,
+    )
+    diagnoser.run(args.inputs)
+    print("일괄 진단 완료!")
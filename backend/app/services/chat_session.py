@@ -0,0 +1,76 @@
+import time
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+
+class ChatSession:
+    """진단 하나에 대한 대화 컨텍스트 (시스템 프롬프트 + 최근 대화 기록)"""
+
+    def __init__(self, diagnosis_id: str, system_prompt: str, overall_diagnosis: str,
+                 max_messages: int = 20, max_chars: int = 8000):
+        self.diagnosis_id = diagnosis_id
+        self.system_prompt = system_prompt
+        self.overall_diagnosis = overall_diagnosis
+        self.max_messages = max_messages
+        self.max_chars = max_chars
+        self.history: List[Dict[str, str]] = []
+        self.omitted_count = 0  # 잘려나간 이전 메시지 수
+        self.last_access = time.monotonic()
+
+    def add_turn(self, user_message: str, assistant_message: str):
+        """사용자/어시스턴트 한 턴 추가 후 기록 길이 제한 적용"""
+        self.history.append({"role": "user", "content": user_message})
+        self.history.append({"role": "assistant", "content": assistant_message})
+        self._truncate()
+
+    def _truncate(self):
+        """메시지 수와 총 글자 수 제한을 넘으면 오래된 턴부터 제거"""
+        while len(self.history) > self.max_messages or (
+            len(self.history) > 2 and sum(len(m["content"]) for m in self.history) > self.max_chars
+        ):
+            # 사용자/어시스턴트 쌍 단위로 제거
+            del self.history[:2]
+            self.omitted_count += 2
+
+
+class ChatSessionCache:
+    """diagnosis_id별 대화 세션을 보관하는 LRU + TTL 메모리 캐시"""
+
+    def __init__(self, max_sessions: int = 256, ttl_seconds: float = 1800,
+                 max_messages: int = 20, max_chars: int = 8000):
+        self.max_sessions = max_sessions
+        self.ttl_seconds = ttl_seconds
+        self.max_messages = max_messages
+        self.max_chars = max_chars
+        self._sessions: "OrderedDict[str, ChatSession]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, diagnosis_id: str) -> Optional[ChatSession]:
+        """세션 조회 (만료 시 제거 후 None)"""
+        with self._lock:
+            session = self._sessions.get(diagnosis_id)
+            if session is None:
+                return None
+            if time.monotonic() - session.last_access > self.ttl_seconds:
+                del self._sessions[diagnosis_id]
+                return None
+            session.last_access = time.monotonic()
+            self._sessions.move_to_end(diagnosis_id)
+            return session
+
+    def put(self, diagnosis_id: str, system_prompt: str, overall_diagnosis: str) -> ChatSession:
+        """세션 생성/교체 후 용량 초과분을 LRU 순서로 제거"""
+        session = ChatSession(
+            diagnosis_id, system_prompt, overall_diagnosis,
+            max_messages=self.max_messages, max_chars=self.max_chars
+        )
+        with self._lock:
+            self._sessions[diagnosis_id] = session
+            self._sessions.move_to_end(diagnosis_id)
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+        return session
+
+    def __len__(self) -> int:
+        return len(self._sessions)
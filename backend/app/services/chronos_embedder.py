@@ -3,50 +3,99 @@ import pandas as pd
 import numpy as np
 from typing import Dict, List, Tuple
 from chronos import BaseChronosPipeline
+from app.utils.profiling import profile_section, torch_trace
+
+CHANNELS = ['AccX', 'AccY', 'AccZ', 'GyrX', 'GyrY', 'GyrZ']
+POOLING_METHOD = "mean"
+
+
+def embedding_version(model_name: str, pooling_method: str = POOLING_METHOD) -> str:
+    """임베딩 호환성 식별자 (모델 + 풀링 방식), 예: amazon/chronos-bolt-tiny:mean"""
+    return f"{model_name}:{pooling_method}"
+
+
+def parse_embedding_version(version: str) -> Tuple[str, str]:
+    """임베딩 버전 문자열을 (모델명, 풀링 방식)으로 분리"""
+    model_name, _, pooling_method = version.rpartition(":")
+    return model_name, pooling_method
 
 class ChronosEmbedder:
-    def __init__(self, model_name: str, device: str):
+    def __init__(self, model_name: str, device: str, batch_size: int = 64):
         self.pipeline = BaseChronosPipeline.from_pretrained(
             model_name,
             device_map=device,
             torch_dtype=torch.bfloat16 if device != "cpu" else torch.float32,
         )
-        
+        self.batch_size = batch_size
+        self.model_name = model_name
+        self.pooling_method = POOLING_METHOD
+        self.model_version = embedding_version(model_name, self.pooling_method)
+
     def embed_channel(self, data: np.ndarray) -> Tuple[np.ndarray, Dict]:
         """단일 채널 데이터 임베딩 및 통계 계산"""
-        # 텐서 변환
-        context = torch.tensor(data, dtype=torch.float32).unsqueeze(0)
-        
-        # 임베딩 생성
-        embeddings, _ = self.pipeline.embed(context)
-        
-        # 시계열 차원 평균 풀링 [1, L, 256] -> [1, 256]
-        pooled_embedding = embeddings.mean(dim=1).squeeze(0).numpy()
-        
-        # 통계 계산
-        stats = {
-            "mean": float(np.mean(data)),
-            "variance": float(np.var(data)),
-            "peak": float(np.max(np.abs(data))),
-            "min": float(np.min(data)),
-            "max": float(np.max(data)),
-            "outlier_count": int(np.sum(np.abs(data - np.mean(data)) > 3 * np.std(data))),
-            "zero_crossing_rate": float(np.sum(np.diff(np.sign(data)) != 0) / len(data))
-        }
-        
-        return pooled_embedding, stats
-    
+        embeddings, stats = self.embed_batch([data])
+        return embeddings[0], stats[0]
+
+    def embed_batch(self, series: List[np.ndarray]) -> Tuple[List[np.ndarray], List[Dict]]:
+        """여러 채널/녹화 데이터를 배치로 임베딩 (같은 길이끼리 묶어 forward pass)"""
+        embeddings = [None] * len(series)
+        stats = [None] * len(series)
+
+        # 길이가 다르면 패딩이 평균 풀링에 섞이므로 길이별로 그룹화
+        groups = {}
+        for i, data in enumerate(series):
+            groups.setdefault(len(data), []).append(i)
+
+        for positions in groups.values():
+            for start in range(0, len(positions), self.batch_size):
+                chunk = positions[start:start + self.batch_size]
+                matrix = np.stack([np.asarray(series[i], dtype=np.float64) for i in chunk])
+
+                # 임베딩 생성 [B, L, 256] -> 시계열 차원 평균 풀링 [B, 256]
+                context = torch.tensor(matrix, dtype=torch.float32)
+                with profile_section("chronos_embed", batch=len(chunk), length=matrix.shape[1]), torch_trace("chronos_embed"):
+                    batch_embeddings, _ = self.pipeline.embed(context)
+                pooled = batch_embeddings.mean(dim=1).float().cpu().numpy()
+
+                for i, embedding, channel_stats in zip(chunk, pooled, self.compute_stats(matrix)):
+                    embeddings[i] = embedding
+                    stats[i] = channel_stats
+
+        return embeddings, stats
+
+    @staticmethod
+    def compute_stats(matrix: np.ndarray) -> List[Dict]:
+        """[B, L] 행렬의 행별 통계 계산"""
+        matrix = np.atleast_2d(matrix)
+        length = matrix.shape[1]
+        mean = matrix.mean(axis=1)
+        std = matrix.std(axis=1)
+        variance = matrix.var(axis=1)
+        peak = np.abs(matrix).max(axis=1)
+        minimum = matrix.min(axis=1)
+        maximum = matrix.max(axis=1)
+        outlier_count = (np.abs(matrix - mean[:, None]) > 3 * std[:, None]).sum(axis=1)
+        zero_crossing_rate = (np.diff(np.sign(matrix), axis=1) != 0).sum(axis=1) / length
+
+        return [
+            {
+                "mean": float(mean[i]),
+                "variance": float(variance[i]),
+                "peak": float(peak[i]),
+                "min": float(minimum[i]),
+                "max": float(maximum[i]),
+                "outlier_count": int(outlier_count[i]),
+                "zero_crossing_rate": float(zero_crossing_rate[i])
+            }
+            for i in range(matrix.shape[0])
+        ]
+
     def process_sensor_data(self, df: pd.DataFrame) -> Dict:
-        """6축 센서 데이터 전체 처리"""
-        channels = ['AccX', 'AccY', 'AccZ', 'GyrX', 'GyrY', 'GyrZ']
-        results = {}
-        
-        for channel in channels:
-            if channel in df.columns:
-                embedding, stats = self.embed_channel(df[channel].values)
-                results[channel] = {
-                    "embedding": embedding,
-                    "stats": stats
-                }
-                
-        return results
+        """6축 센서 데이터 전체 처리 (채널 6개를 한 번의 배치로 임베딩)"""
+        channels = [channel for channel in CHANNELS if channel in df.columns]
+        embeddings, stats = self.embed_batch([df[channel].values for channel in channels])
+
+        return {
+            channel: {"embedding": embedding, "stats": channel_stats}
+            for channel, embedding, channel_stats in zip(channels, embeddings, stats)
+        }
@@ -1,46 +1,18 @@
-from typing import List, Dict
+from typing import AsyncIterator, List, Dict, Optional, Tuple
 from langchain_openai import ChatOpenAI
-from langchain_core.messages import SystemMessage, HumanMessage
+from langchain_core.messages import SystemMessage, HumanMessage, AIMessage
 from langchain_core.prompts import ChatPromptTemplate
 from langchain.chains import LLMChain
 from langchain_core.output_parsers import JsonOutputParser
 import json
+from app.services.feature_extractor import GaitFeatureExtractor
+from app.utils.token_counter import count_tokens
 
-class DiagnosisChain:
-    def __init__(self, openai_api_key: str):
-        """진단 체인 초기화"""
-        self.llm = ChatOpenAI(
-            model_name="gpt-4",
-            temperature=0.2,
-            openai_api_key=openai_api_key
-        )
-        
-    def create_system_prompt(self, diagnoses: List[Dict], sensor_stats: Dict) -> str:
-        """진단 텍스트와 센서 통계를 기반으로 시스템 프롬프트 생성"""
-        prompt = """You are an expert gait analysis system specializing in 6-axis sensor data (3-axis accelerometer and 3-axis gyroscope).
+PROMPT_HEADER = """You are an expert gait analysis system specializing in 6-axis sensor data (3-axis accelerometer and 3-axis gyroscope).
 
-Based on the sensor pattern analysis, the following conditions were detected:
-
-**Detected Conditions (similarity > 80%):**
-"""
-        # 진단 텍스트 추가
-        for diag in diagnoses:
-            prompt += f"\n- {diag['diagnosis_text']} (Severity: {diag['severity']}, Confidence: {diag['similarity']:.1f}%)"
-            
-        prompt += "\n\n**Raw Sensor Statistics:**\n"
-        
-        # 원본 센서 통계 추가
-        for channel, stats in sensor_stats.items():
-            prompt += f"\n{channel}:"
-            prompt += f"\n  - Mean: {stats['mean']:.4f}"
-            prompt += f"\n  - Variance: {stats['variance']:.4f}"
-            prompt += f"\n  - Peak: {stats['peak']:.4f}"
-            prompt += f"\n  - Outliers: {stats['outlier_count']}"
-            prompt += f"\n  - Zero-crossing rate: {stats['zero_crossing_rate']:.4f}"
-            
-        prompt += """
+Based on the sensor pattern analysis, the following conditions were detected."""
 
-**Diagnostic Guidelines:**
+PROMPT_GUIDELINES = """**Diagnostic Guidelines:**
 1. Analyze the combination of detected conditions
 2. Consider the severity levels (normal < warning < critical)
 3. Identify primary and secondary issues
@@ -53,8 +25,80 @@ Please provide a comprehensive diagnosis in the following format:
 3. Overall Gait Assessment
 4. Specific Recommendations
 5. Follow-up Suggestions"""
+
+class DiagnosisChain:
+    def __init__(self, openai_api_key: str, token_budget: int = 1500):
+        """진단 체인 초기화"""
+        self.llm = ChatOpenAI(
+            model_name="gpt-4",
+            temperature=0.2,
+            openai_api_key=openai_api_key
+        )
+        self.token_budget = token_budget  # 시스템 프롬프트 최대 토큰 수
         
-        return prompt
+    def create_system_prompt(self, diagnoses: List[Dict], sensor_stats: Dict, gait_features: Optional[Dict] = None) -> str:
+        """진단 텍스트와 센서 통계를 기반으로 시스템 프롬프트 생성"""
+        return self.build_system_prompt(diagnoses, sensor_stats, gait_features)[0]
+        
+    def build_system_prompt(self, diagnoses: List[Dict], sensor_stats: Dict,
+                            gait_features: Optional[Dict] = None) -> Tuple[str, int]:
+        """토큰 예산 안에서 시스템 프롬프트 생성, (프롬프트, 토큰 수) 반환"""
+        stats_lines = ["**Raw Sensor Statistics:**", "Channel | Mean | Variance | Peak | Outliers | ZCR", "--- | --- | --- | --- | --- | ---"]
+        stats_lines += [
+            f"{channel} | {stats['mean']:.4g} | {stats['variance']:.4g} | {stats['peak']:.4g} | "
+            f"{stats['outlier_count']} | {stats['zero_crossing_rate']:.4g}"
+            for channel, stats in sensor_stats.items()
+        ]
+        
+        # 주파수/보행 주기 특징
+        feature_lines = []
+        if gait_features:
+            feature_lines = ["**Spectral & Gait-Cycle Features:**"]
+            feature_lines += [f"- {line}" for line in GaitFeatureExtractor.summarize(gait_features)]
+        
+        sections = [PROMPT_HEADER, "**Detected Conditions:**", None, "\n".join(stats_lines)]
+        if feature_lines:
+            sections.append("\n".join(feature_lines))
+        sections.append(PROMPT_GUIDELINES)
+        
+        # 고정 섹션을 제외한 남은 예산만큼 상위 진단을 포함
+        fixed_tokens = sum(count_tokens(section) for section in sections if section)
+        condition_lines = self._condition_lines(diagnoses, self.token_budget - fixed_tokens)
+        sections[2] = "\n".join(condition_lines) if condition_lines else "- None above the similarity threshold"
+        
+        prompt = "\n\n".join(sections)
+        return prompt, count_tokens(prompt)
+    
+    @staticmethod
+    def _condition_lines(diagnoses: List[Dict], budget: int) -> List[str]:
+        """같은 상태의 중복 매칭을 합치고(최고 유사도, 채널 목록) 유사도 순으로 예산만큼 선택"""
+        merged = {}
+        for diag in diagnoses:
+            key = diag.get('condition_type') or diag['diagnosis_text']
+            entry = merged.setdefault(key, {
+                "diagnosis_text": diag['diagnosis_text'],
+                "severity": diag['severity'],
+                "similarity": diag['similarity'],
+                "channels": []
+            })
+            entry["similarity"] = max(entry["similarity"], diag['similarity'])
+            if diag.get('channel') and diag['channel'] not in entry["channels"]:
+                entry["channels"].append(diag['channel'])
+        
+        lines = []
+        used = 0
+        ranked = sorted(merged.values(), key=lambda entry: entry["similarity"], reverse=True)
+        for index, entry in enumerate(ranked):
+            channels = f", Channels: {'/'.join(entry['channels'])}" if entry["channels"] else ""
+            line = f"- {entry['diagnosis_text']} (Severity: {entry['severity']}, Confidence: {entry['similarity']:.1f}%{channels})"
+            tokens = count_tokens(line) + 1
+            # 최상위 진단은 예산과 관계없이 포함
+            if lines and used + tokens > budget:
+                lines.append(f"- ({len(ranked) - index} lower-confidence conditions omitted)")
+                break
+            lines.append(line)
+            used += tokens
+        return lines
     
     def generate_diagnosis(self, system_prompt: str, user_query: str = "") -> Dict:
         """진단 생성"""
@@ -78,6 +122,61 @@ Please provide a comprehensive diagnosis in the following format:
             "recommendations": recommendations
         }
     
+    def generate_templated_diagnosis(self, screening: Dict, matched_diagnoses: List[Dict], sensor_stats: Dict) -> Dict:
+        """사전 판정(prescreening)으로 정상인 세션의 LLM 없는 템플릿 진단"""
+        findings = sorted({diag['diagnosis_text'] for diag in matched_diagnoses})
+        response = (
+            "1. Primary Condition\n"
+            "No abnormal gait pattern was detected.\n\n"
+            "2. Secondary Findings\n"
+            + (f"Matched reference patterns: {', '.join(findings)}.\n\n" if findings else "None.\n\n")
+            + "3. Overall Gait Assessment\n"
+            f"Gait appears within normal limits across {len(sensor_stats)} sensor axes "
+            f"(screening confidence {screening['score'] * 100:.1f}%).\n\n"
+            "4. Specific Recommendations\n"
+            "- Maintain regular physical activity\n"
+            "- Repeat the assessment at the next routine check-up\n\n"
+            "5. Follow-up Suggestions\n"
+            "No additional follow-up required unless symptoms appear."
+        )
+        
+        # LLM 경로와 같은 규칙으로 심각도 결정
+        return {
+            "overall_diagnosis": response,
+            "severity_level": self._determine_overall_severity(response),
+            "recommendations": self._extract_recommendations(response)
+        }
+    
+    def build_chat_messages(self, session, user_message: str) -> List:
+        """캐시된 진단 컨텍스트와 최근 대화 기록으로 후속 질문 메시지 구성"""
+        system_content = (
+            f"{session.system_prompt}\n\n"
+            f"**Previous Diagnosis:**\n{session.overall_diagnosis}\n\n"
+            "Answer the user's follow-up questions about this diagnosis concisely."
+        )
+        if session.omitted_count:
+            system_content += f"\n({session.omitted_count} earlier messages in this conversation were omitted.)"
+        
+        messages = [SystemMessage(content=system_content)]
+        for message in session.history:
+            if message["role"] == "user":
+                messages.append(HumanMessage(content=message["content"]))
+            else:
+                messages.append(AIMessage(content=message["content"]))
+        messages.append(HumanMessage(content=user_message))
+        return messages
+    
+    async def chat(self, messages: List) -> str:
+        """후속 질문 응답 (LLM 1회 호출)"""
+        response = await self.llm.ainvoke(messages)
+        return response.content
+    
+    async def stream_chat(self, messages: List) -> AsyncIterator[str]:
+        """후속 질문 응답 스트리밍"""
+        async for chunk in self.llm.astream(messages):
+            if chunk.content:
+                yield chunk.content
+    
     def _determine_overall_severity(self, diagnosis: str) -> str:
         """전체 진단의 심각도 결정"""
         diagnosis_lower = diagnosis.lower()
@@ -1,18 +1,25 @@
+import argparse
+import zlib
 import numpy as np
-from typing import List, Dict
-from app.utils.db_client import get_supabase_client
+from typing import List, Dict, Optional
+from app.utils.db_client import get_supabase_client, get_active_model_name
 from app.services.chronos_embedder import ChronosEmbedder
 from app.config import settings
+from app.utils.vector_codec import encode_vector
 
 class DiagnosisKnowledgeSeeder:
     """진단 지식베이스 초기 데이터 생성"""
     
-    def __init__(self):
+    def __init__(self, n_samples: int = 200, insert_batch_size: int = 500, seed: int = 42,
+                 embedder: Optional[ChronosEmbedder] = None):
         self.supabase = get_supabase_client()
-        self.embedder = ChronosEmbedder(settings.CHRONOS_MODEL, settings.DEVICE)
+        self.embedder = embedder or ChronosEmbedder(get_active_model_name(self.supabase), settings.DEVICE)
+        self.n_samples = n_samples
+        self.insert_batch_size = insert_batch_size
+        self.seed = seed
         
-    def seed_knowledge_base(self):
-        """진단 지식 초기 데이터 삽입"""
+    def seed_knowledge_base(self, variants: int = 1):
+        """진단 지식 데이터 생성 후 upsert (condition_type + variant + 임베딩 버전 기준으로 재실행 시 덮어씀)"""
         
         # 가속도계 진단 패턴
         acc_patterns = [
@@ -128,67 +135,87 @@ class DiagnosisKnowledgeSeeder:
         # 모든 패턴에 대해 임베딩 생성 및 저장
         all_patterns = acc_patterns + gyro_patterns
         
+        # 패턴별 합성 변형 생성 (패턴마다 독립 Generator로 재현성 유지)
+        series = []
+        rows = []
         for pattern in all_patterns:
-            # 패턴에 맞는 합성 데이터 생성
-            synthetic_data = self._generate_synthetic_pattern(
-                pattern["channel"], 
-                pattern["pattern_stats"]
-            )
-            
-            # 임베딩 생성
-            embedding, _ = self.embedder.embed_channel(synthetic_data)
-            
-            # DB에 저장
-            self.supabase.table('diagnosis_knowledge').insert({
-                "pattern_embedding": embedding.tolist(),
-                "channel_name": pattern["channel"],
-                "diagnosis_text": pattern["diagnosis"],
-                "severity": pattern["severity"],
-                "condition_type": pattern["condition"],
-                "pattern_stats": pattern["pattern_stats"]
-            }).execute()
+            rng = self._pattern_rng(pattern["condition"])
+            synthetic_data = self._generate_synthetic_variants(pattern["pattern_stats"], variants, rng)
+            for variant, data in enumerate(synthetic_data):
+                series.append(data)
+                rows.append({
+                    "channel_name": pattern["channel"],
+                    "diagnosis_text": pattern["diagnosis"],
+                    "severity": pattern["severity"],
+                    "condition_type": pattern["condition"],
+                    "variant": variant,
+                    "model_version": self.embedder.model_version,
+                    "pattern_stats": pattern["pattern_stats"]
+                })
+        
+        # 전체 변형을 대규모 배치로 임베딩
+        embeddings, _ = self.embedder.embed_batch(series)
+        for row, embedding in zip(rows, embeddings):
+            row["pattern_embedding"] = encode_vector(embedding)
+        
+        # DB에 일괄 upsert
+        for start in range(0, len(rows), self.insert_batch_size):
+            self.supabase.table('diagnosis_knowledge').upsert(
+                rows[start:start + self.insert_batch_size],
+                on_conflict="condition_type,variant,model_version"
+            ).execute()
             
-            print(f"Added: {pattern['diagnosis']}")
+        for pattern in all_patterns:
+            print(f"Added: {pattern['diagnosis']} ({variants} variants)")
+    
+    def _pattern_rng(self, condition: str) -> np.random.Generator:
+        """패턴별 독립 난수 생성기 (전역 시드를 건드리지 않음)"""
+        return np.random.default_rng([self.seed, zlib.crc32(condition.encode("utf-8"))])
     
-    def _generate_synthetic_pattern(self, channel: str, stats: Dict) -> np.ndarray:
-        """통계 특성에 맞는 합성 데이터 생성"""
-        np.random.seed(42)  # 재현성을 위해
+    def _generate_synthetic_variants(self, stats: Dict, n_variants: int, rng: np.random.Generator) -> np.ndarray:
+        """통계 범위에 맞는 합성 데이터 [n_variants, n_samples] 생성
         
-        # 기본 200개 샘플
-        n_samples = 200
+        variant 0은 각 범위의 중앙값, 나머지는 범위 안에서 균등 샘플링한 값을 사용
+        """
+        n_samples = self.n_samples
+        
+        def sample_range(key: str, default: float) -> np.ndarray:
+            if key not in stats:
+                return np.full(n_variants, default)
+            low, high = stats[key]
+            values = rng.uniform(low, high, n_variants)
+            values[0] = (low + high) / 2
+            return values
+        
+        # 평균/분산 설정
+        mean = sample_range("mean", 0.0)
+        std = np.sqrt(sample_range("variance", 1.0))
         
-        # 평균값 설정
-        if "mean" in stats:
-            mean = np.mean(stats["mean"])
-        else:
-            mean = 0.0
-            
-        # 분산값 설정
-        if "variance" in stats:
-            std = np.sqrt(np.mean(stats["variance"]))
-        else:
-            std = 1.0
-            
         # 기본 신호 생성
-        data = np.random.normal(mean, std, n_samples)
+        data = rng.normal(size=(n_variants, n_samples)) * std[:, None] + mean[:, None]
         
-        # 피크값 추가
+        # 피크값 추가 (변형마다 서로 다른 위치 5개)
         if "peak" in stats:
-            peak_indices = np.random.choice(n_samples, size=5, replace=False)
-            peak_value = np.mean(stats["peak"])
-            data[peak_indices] = peak_value * np.random.choice([-1, 1], size=5)
+            peak_value = sample_range("peak", 0.0)
+            peak_indices = np.argsort(rng.random((n_variants, n_samples)), axis=1)[:, :5]
+            signs = rng.choice([-1, 1], size=(n_variants, 5))
+            np.put_along_axis(data, peak_indices, peak_value[:, None] * signs, axis=1)
             
         # 영점 교차율 조정을 위한 주파수 성분 추가
         if "zero_crossing_rate" in stats:
-            zcr_target = np.mean(stats["zero_crossing_rate"])
-            freq = zcr_target * 10  # 대략적인 주파수
+            freq = sample_range("zero_crossing_rate", 0.0) * 10  # 대략적인 주파수
             t = np.linspace(0, 20, n_samples)
-            data += 0.1 * np.sin(2 * np.pi * freq * t)
+            data += 0.1 * np.sin(2 * np.pi * freq[:, None] * t[None, :])
             
         return data
 
 # 사용 예시
 if __name__ == "__main__":
-    seeder = DiagnosisKnowledgeSeeder()
-    seeder.seed_knowledge_base()
+    parser = argparse.ArgumentParser(description="Seed the diagnosis knowledge base")
+    parser.add_argument("--variants", type=int, default=1, help="패턴별 합성 변형 개수")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+    
+    seeder = DiagnosisKnowledgeSeeder(seed=args.seed)
+    seeder.seed_knowledge_base(variants=args.variants)
     print("진단 지식베이스 초기화 완료!")
\ No newline at end of file
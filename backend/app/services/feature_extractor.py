@@ -0,0 +1,149 @@
+import numpy as np
+import pandas as pd
+from typing import Dict, List, Optional, Tuple
+
+CHANNELS = ['AccX', 'AccY', 'AccZ', 'GyrX', 'GyrY', 'GyrZ']
+
+# 주파수 대역 (Hz): 보행 리듬 / 파킨슨형 떨림(4-6Hz) 포함 떨림 대역 / 고주파 잡음
+FREQUENCY_BANDS = {
+    "gait": (0.5, 3.0),
+    "tremor": (3.0, 8.0),
+    "high": (8.0, 20.0),
+}
+
+# 한 걸음 주기 탐색 범위 (초)
+STEP_PERIOD_RANGE = (0.3, 1.5)
+
+
+class GaitFeatureExtractor:
+    """6축 전체를 한 번에 처리하는 주파수/보행 주기 특징 추출기"""
+
+    def __init__(self, sampling_rate: float = 100.0):
+        self.sampling_rate = sampling_rate
+
+    def extract(self, df: pd.DataFrame) -> Dict:
+        """업로드 데이터의 채널별 스펙트럼 특징 + 세션 단위 보행 특징"""
+        channels = [channel for channel in CHANNELS if channel in df.columns]
+        matrix = df[channels].to_numpy(dtype=np.float64).T  # [C, L]
+
+        spectral = self._spectral_features(matrix)
+        gait = self._gait_cycle_features(df)
+
+        return {
+            "sampling_rate": self.sampling_rate,
+            "channels": {
+                channel: {name: float(values[i]) for name, values in spectral.items()}
+                for i, channel in enumerate(channels)
+            },
+            "gait": gait
+        }
+
+    def _spectral_features(self, matrix: np.ndarray) -> Dict[str, np.ndarray]:
+        """채널 행렬 [C, L]에 대한 배치 FFT 대역 파워와 주 주파수"""
+        centered = matrix - matrix.mean(axis=1, keepdims=True)
+        window = np.hanning(matrix.shape[1])
+        power = np.abs(np.fft.rfft(centered * window, axis=1)) ** 2
+        freqs = np.fft.rfftfreq(matrix.shape[1], d=1.0 / self.sampling_rate)
+
+        total = power[:, 1:].sum(axis=1) + 1e-12
+        features = {}
+        for name, (low, high) in FREQUENCY_BANDS.items():
+            mask = (freqs >= low) & (freqs < high)
+            features[f"{name}_band_ratio"] = power[:, mask].sum(axis=1) / total
+
+        # DC 성분을 제외한 최대 파워 주파수
+        features["dominant_frequency"] = freqs[1:][np.argmax(power[:, 1:], axis=1)]
+        return features
+
+    def _autocorrelation(self, matrix: np.ndarray) -> np.ndarray:
+        """FFT 기반 정규화 자기상관 [C, L]"""
+        length = matrix.shape[1]
+        centered = matrix - matrix.mean(axis=1, keepdims=True)
+        spectrum = np.fft.rfft(centered, n=2 * length, axis=1)
+        acf = np.fft.irfft(spectrum * np.conj(spectrum), axis=1)[:, :length]
+        return acf / (acf[:, :1] + 1e-12)
+
+    def _gait_cycle_features(self, df: pd.DataFrame) -> Dict:
+        """가속도 크기의 자기상관으로 걸음/보폭 주기, 케이던스, 좌우 대칭성 추정"""
+        acc_channels = [channel for channel in ('AccX', 'AccY', 'AccZ') if channel in df.columns]
+        if not acc_channels:
+            return {}
+        magnitude = np.linalg.norm(df[acc_channels].to_numpy(dtype=np.float64), axis=1)
+        acf = self._autocorrelation(magnitude[None, :])[0]
+
+        min_lag = int(STEP_PERIOD_RANGE[0] * self.sampling_rate)
+        max_lag = min(int(STEP_PERIOD_RANGE[1] * self.sampling_rate), len(acf) // 2 - 1)
+        if max_lag <= min_lag:
+            return {}
+
+        # 최고 자기상관 peak는 걸음 주기일 수도(대칭 보행) 보폭 주기일 수도(비대칭 보행) 있으므로,
+        # 그 절반 부근에 양의 peak가 있으면 그것을 걸음, 원래 peak를 보폭으로 보고 없으면 두 배 부근에서 보폭을 찾음
+        peak_lag = min_lag + int(np.argmax(acf[min_lag:max_lag]))
+        half_lag = self._local_peak(acf, peak_lag / 2)
+        if half_lag is not None and half_lag >= min_lag and acf[half_lag] > 0:
+            step_lag, stride_lag = half_lag, peak_lag
+        else:
+            step_lag = peak_lag
+            stride_lag = self._local_peak(acf, peak_lag * 2)
+            if stride_lag is None:
+                return {}
+
+        step_regularity = float(acf[step_lag])
+        stride_regularity = float(acf[stride_lag])
+        step_time = step_lag / self.sampling_rate
+
+        return {
+            "step_time": step_time,
+            "cadence": 60.0 / step_time,  # steps/min
+            "step_regularity": step_regularity,
+            "stride_regularity": stride_regularity,
+            # 좌/우 걸음이 같을수록 1에 가까움
+            "stride_symmetry": step_regularity / stride_regularity if stride_regularity > 0 else 0.0
+        }
+
+    @staticmethod
+    def _local_peak(acf: np.ndarray, center: float, tolerance: float = 0.25) -> Optional[int]:
+        """center ± tolerance 비율 구간의 자기상관 최댓값 위치 (구간 경계면 실제 peak가 아니므로 None)"""
+        start = max(int(center * (1 - tolerance)), 1)
+        stop = min(int(center * (1 + tolerance)) + 1, len(acf) - 1)
+        if stop - start < 3:
+            return None
+        lag = start + int(np.argmax(acf[start:stop]))
+        if lag in (start, stop - 1):
+            return None
+        return lag
+
+    @staticmethod
+    def is_clearly_normal(features: Dict, max_tremor_ratio: float = 0.15,
+                          min_symmetry: float = 0.8, cadence_range: Tuple[float, float] = (80.0, 130.0)) -> bool:
+        """Chronos 임베딩을 생략해도 될 만큼 명확히 정상인 세션인지 판단"""
+        gait = features.get("gait") or {}
+        if not gait:
+            return False
+
+        tremor = max(
+            (stats["tremor_band_ratio"] for channel, stats in features["channels"].items() if channel.startswith("Gyr")),
+            default=1.0
+        )
+        return (
+            tremor <= max_tremor_ratio
+            and gait["stride_symmetry"] >= min_symmetry
+            and cadence_range[0] <= gait["cadence"] <= cadence_range[1]
+        )
+
+    @staticmethod
+    def summarize(features: Dict) -> List[str]:
+        """프롬프트용 요약 라인"""
+        lines = []
+        gait = features.get("gait") or {}
+        if gait:
+            lines.append(
+                f"Cadence: {gait['cadence']:.1f} steps/min, step time {gait['step_time']:.2f}s, "
+                f"stride symmetry {gait['stride_symmetry']:.2f}, step regularity {gait['step_regularity']:.2f}"
+            )
+        for channel, stats in features.get("channels", {}).items():
+            lines.append(
+                f"{channel}: dominant {stats['dominant_frequency']:.2f}Hz, "
+                f"gait band {stats['gait_band_ratio']:.2f}, tremor band {stats['tremor_band_ratio']:.2f}"
+            )
+        return lines
@@ -0,0 +1,84 @@
+import numpy as np
+from typing import Dict, List
+
+# pattern_stats에서 범위로 비교하는 통계 항목
+STAT_KEYS = ['mean', 'variance', 'peak', 'min', 'max', 'outlier_count', 'zero_crossing_rate']
+
+
+class StatRangeReranker:
+    """임베딩 유사도 후보를 pattern_stats 범위 일치도와 섞어 재정렬
+
+    지식 패턴별 [low, high] 범위를 [N, K] 행렬로 미리 만들어두고, 후보 전체를 한 번의 NumPy 연산으로 채점한다.
+    """
+
+    def __init__(self, alpha: float = 0.7):
+        self.alpha = alpha  # 임베딩 유사도 가중치 (1 - alpha는 통계 범위 점수)
+        self.positions: Dict[str, int] = {}
+        self.low = np.empty((0, len(STAT_KEYS)))
+        self.high = np.empty((0, len(STAT_KEYS)))
+        self.mask = np.empty((0, len(STAT_KEYS)), dtype=bool)
+
+    @staticmethod
+    def _range_rows(pattern_stats_list: List[Dict]):
+        """pattern_stats 목록을 (low, high, mask) 행렬로 변환"""
+        count = len(pattern_stats_list)
+        low = np.zeros((count, len(STAT_KEYS)))
+        high = np.zeros((count, len(STAT_KEYS)))
+        mask = np.zeros((count, len(STAT_KEYS)), dtype=bool)
+        for i, pattern_stats in enumerate(pattern_stats_list):
+            for j, key in enumerate(STAT_KEYS):
+                bounds = (pattern_stats or {}).get(key)
+                if bounds and len(bounds) == 2:
+                    low[i, j], high[i, j] = min(bounds), max(bounds)
+                    mask[i, j] = True
+        return low, high, mask
+
+    def fit(self, knowledge: List[Dict]):
+        """지식베이스 전체의 범위 행렬 사전 계산"""
+        self.positions = {str(item['id']): i for i, item in enumerate(knowledge)}
+        self.low, self.high, self.mask = self._range_rows([item['pattern_stats'] for item in knowledge])
+
+    def _candidate_ranges(self, candidates: List[Dict]):
+        """후보의 범위 행 조회 (사전 계산에 없으면 즉석 계산, 예: pgvector 백엔드)"""
+        positions = [self.positions.get(str(candidate['id'])) for candidate in candidates]
+        if all(position is not None for position in positions):
+            return self.low[positions], self.high[positions], self.mask[positions]
+        return self._range_rows([candidate['pattern_stats'] for candidate in candidates])
+
+    @staticmethod
+    def query_matrix(stats_list: List[Dict]) -> np.ndarray:
+        """후보별 쿼리 채널 통계를 [M, K] 행렬로 변환 (없는 항목은 NaN)"""
+        return np.array(
+            [[(stats or {}).get(key, np.nan) for key in STAT_KEYS] for stats in stats_list],
+            dtype=np.float64
+        ).reshape(len(stats_list), len(STAT_KEYS))
+
+    def stat_scores(self, candidates: List[Dict], query: np.ndarray) -> np.ndarray:
+        """후보별 통계 범위 일치도 [0, 1] (query: 후보와 같은 순서의 [M, K] 쿼리 통계)
+
+        범위 안이면 1, 밖이면 범위 폭 대비 벗어난 거리에 따라 지수적으로 감소, 범위나 쿼리 값이 없는 항목은 제외
+        """
+        if not candidates:
+            return np.empty(0)
+        low, high, mask = self._candidate_ranges(candidates)
+
+        query = np.asarray(query, dtype=np.float64)
+        mask = mask & ~np.isnan(query)
+        query = np.nan_to_num(query)
+
+        width = np.maximum(high - low, 1e-6)
+        distance = np.maximum(low - query, 0) + np.maximum(query - high, 0)
+        per_stat = np.exp(-distance / width)
+
+        counts = mask.sum(axis=1)
+        scores = np.where(mask, per_stat, 0).sum(axis=1) / np.maximum(counts, 1)
+        # 비교할 범위가 없는 후보는 NaN (임베딩 유사도만 반영)
+        return np.where(counts > 0, scores, np.nan)
+
+    def blend(self, similarities: np.ndarray, stat_scores: np.ndarray) -> np.ndarray:
+        """임베딩 유사도(코사인)와 통계 점수 혼합"""
+        return np.where(
+            np.isnan(stat_scores),
+            similarities,
+            self.alpha * similarities + (1 - self.alpha) * np.nan_to_num(stat_scores)
+        )
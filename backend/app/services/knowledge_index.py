@@ -0,0 +1,144 @@
+import numpy as np
+import faiss
+from typing import List, Dict, Optional, Tuple
+from supabase import Client
+from app.utils.vector_codec import decode_vector, encode_vector
+
+# 검색 결과: (코사인 유사도, 지식 메타데이터)
+SearchHit = Tuple[float, Dict]
+
+
+def _knowledge_metadata(row: Dict) -> Dict:
+    """diagnosis_knowledge 행을 검색 결과 메타데이터로 변환"""
+    return {
+        "id": row['id'],
+        "channel": row['channel_name'],
+        "diagnosis": row['diagnosis_text'],
+        "severity": row['severity'],
+        "condition_type": row['condition_type'],
+        "pattern_stats": row['pattern_stats']
+    }
+
+
+def _normalize(vector: np.ndarray) -> np.ndarray:
+    """L2 정규화된 [1, dim] float32 쿼리 벡터"""
+    vector = np.asarray(vector, dtype=np.float32).reshape(1, -1)
+    return vector / np.linalg.norm(vector)
+
+
+class FaissKnowledgeIndex:
+    """프로세스 메모리에 지식베이스를 올려두는 FAISS 검색 백엔드"""
+
+    name = "faiss"
+
+    def __init__(self, embedding_dim: int = 256):
+        self.embedding_dim = embedding_dim
+        self.index = faiss.IndexFlatIP(embedding_dim)  # 내적 유사도 (정규화 후 코사인)
+        self.knowledge_map = {}  # index -> diagnosis knowledge
+        self.channel_indices = {}  # channel -> (faiss index, 전역 index 목록)
+
+    def load(self, rows: List[Dict]) -> int:
+        """diagnosis_knowledge 행들로 인덱스 구성"""
+        vectors = []
+        for row in rows:
+            try:
+                vector = decode_vector(row['pattern_embedding'])
+                vectors.append(vector / np.linalg.norm(vector))
+                self.knowledge_map[len(vectors) - 1] = _knowledge_metadata(row)
+            except Exception as e:
+                print(f"Error processing embedding for knowledge {row.get('id')}: {str(e)}")
+                continue
+
+        if not vectors:
+            return 0
+
+        matrix = np.vstack(vectors).astype(np.float32)
+        self.index.add(matrix)
+
+        # 채널 필터 검색용 채널별 서브 인덱스
+        channels = np.array([self.knowledge_map[i]['channel'] for i in range(len(vectors))])
+        for channel in np.unique(channels):
+            positions = np.flatnonzero(channels == channel)
+            channel_index = faiss.IndexFlatIP(self.embedding_dim)
+            channel_index.add(matrix[positions])
+            self.channel_indices[str(channel)] = (channel_index, positions)
+
+        return len(vectors)
+
+    def search(self, query_vector: np.ndarray, k: int, channel: Optional[str] = None) -> List[SearchHit]:
+        """상위 k개 검색 (channel 지정 시 해당 채널 패턴만)"""
+        query = _normalize(query_vector)
+
+        if channel is None:
+            index, positions = self.index, None
+        elif channel in self.channel_indices:
+            index, positions = self.channel_indices[channel]
+        else:
+            return []
+
+        if index.ntotal == 0:
+            return []
+
+        scores, indices = index.search(query, min(k, index.ntotal))
+        hits = []
+        for score, idx in zip(scores[0], indices[0]):
+            if idx < 0:
+                continue
+            global_idx = int(positions[idx]) if positions is not None else int(idx)
+            hits.append((float(score), self.knowledge_map[global_idx]))
+        return hits
+
+    def size(self) -> int:
+        return self.index.ntotal
+
+    def memory_bytes(self) -> int:
+        """벡터 저장에 사용되는 메모리 (전역 + 채널별 인덱스)"""
+        total = self.index.ntotal
+        total += sum(index.ntotal for index, _ in self.channel_indices.values())
+        return total * self.embedding_dim * 4
+
+
+class PgVectorKnowledgeIndex:
+    """Postgres(pgvector) 안에서 코사인 검색을 수행하는 RPC 검색 백엔드"""
+
+    name = "pgvector"
+
+    def __init__(self, supabase_client: Client, function_name: str = "match_diagnosis_knowledge",
+                 model_version: Optional[str] = None):
+        self.client = supabase_client
+        self.function_name = function_name
+        self.model_version = model_version
+
+    def load(self, rows: List[Dict] = None) -> int:
+        """DB에서 직접 검색하므로 로드할 데이터 없음"""
+        return 0
+
+    def search(self, query_vector: np.ndarray, k: int, channel: Optional[str] = None) -> List[SearchHit]:
+        """상위 k개 검색 (channel 지정 시 해당 채널 패턴만)"""
+        response = self.client.rpc(self.function_name, {
+            "query_embedding": encode_vector(_normalize(query_vector)),
+            "match_count": k,
+            "filter_channel": channel,
+            "filter_model_version": self.model_version
+        }).execute()
+
+        return [
+            (float(row['similarity']), _knowledge_metadata(row))
+            for row in response.data or []
+        ]
+
+    def size(self) -> int:
+        return 0
+
+    def memory_bytes(self) -> int:
+        return 0
+
+
+def create_knowledge_index(backend: str, supabase_client: Client, embedding_dim: int = 256,
+                           model_version: Optional[str] = None):
+    """설정값에 따른 검색 백엔드 생성"""
+    if backend == "faiss":
+        return FaissKnowledgeIndex(embedding_dim)
+    if backend == "pgvector":
+        return PgVectorKnowledgeIndex(supabase_client, model_version=model_version)
+    raise ValueError(f"Unknown retrieval backend: {backend}")
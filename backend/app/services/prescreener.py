@@ -0,0 +1,49 @@
+from typing import Dict, List, Optional
+from app.services.feature_extractor import GaitFeatureExtractor
+
+
+class DiagnosisPrescreener:
+    """RAG 매칭 결과와 채널 통계로 LLM 없이 정상 판정이 가능한지 결정하는 규칙 단계"""
+
+    def __init__(self, min_similarity: float = 85.0, max_outlier_count: int = 5, min_score: float = 0.8):
+        self.min_similarity = min_similarity
+        self.max_outlier_count = max_outlier_count
+        self.min_score = min_score
+
+    def screen(self, matched_diagnoses: List[Dict], sensor_stats: Dict, gait_features: Optional[Dict] = None) -> Optional[Dict]:
+        """명확히 정상이면 판정 근거(score, reason)를, 아니면 None 반환"""
+        # 비정상 패턴이 하나라도 매칭되면 LLM 경로
+        if any(diag['severity'] != 'normal' for diag in matched_diagnoses):
+            return None
+
+        # 채널 통계 이상치 확인
+        if any(stats.get('outlier_count', 0) > self.max_outlier_count for stats in sensor_stats.values()):
+            return None
+
+        # 보행 특징이 있으면 사전 필터와 같은 기준으로 확인
+        gait_normal = bool(gait_features) and GaitFeatureExtractor.is_clearly_normal(gait_features)
+        if gait_features and gait_features.get("gait") and not gait_normal:
+            return None
+
+        if matched_diagnoses:
+            # 정상 패턴만 매칭: 상위 유사도를 신뢰도로 사용
+            top_similarity = max(diag['similarity'] for diag in matched_diagnoses)
+            if top_similarity < self.min_similarity:
+                return None
+            score = top_similarity / 100
+            reason = "all_matches_normal"
+        elif gait_features and gait_features.get("prefiltered_normal"):
+            # 사전 필터에서 이미 명확히 정상으로 판정되어 임베딩 생략
+            score = 1.0
+            reason = "prefiltered_normal"
+        elif gait_normal:
+            # 매칭 없음만으로는 근거가 부족하므로 보행 특징이 정상 기준을 통과해야 함
+            score = min(1.0, gait_features["gait"]["stride_symmetry"])
+            reason = "gait_features_normal"
+        else:
+            # 정상이라는 근거 없음 (보행 특징 없는 세션, 빈 지식베이스 등)
+            return None
+
+        if score < self.min_score:
+            return None
+        return {"score": score, "reason": reason}
@@ -1,125 +1,137 @@
 import numpy as np
-import faiss
-from typing import List, Dict, Tuple
+from typing import List, Dict, Optional
 from supabase import Client
-import json
+from app.config import settings
+from app.services.hybrid_reranker import StatRangeReranker
+from app.services.knowledge_index import create_knowledge_index, PgVectorKnowledgeIndex
+from app.utils.db_client import fetch_all
+from app.utils.vector_codec import decode_vector
+from app.utils.profiling import profile_section
+
+# 지식베이스 로드 시 조회하는 컬럼 (검색 메타데이터 + 임베딩)
+KNOWLEDGE_COLUMNS = "id, channel_name, diagnosis_text, severity, condition_type, pattern_stats, pattern_embedding"
 
 class RAGService:
-    def __init__(self, supabase_client: Client, embedding_dim: int = 256):
+    def __init__(self, supabase_client: Client, embedding_dim: int = 256, backend: Optional[str] = None,
+                 model_version: Optional[str] = None):
         self.client = supabase_client
         self.embedding_dim = embedding_dim
-        self.index = faiss.IndexFlatIP(embedding_dim)  # 내적 유사도
-        self.knowledge_map = {}  # index -> diagnosis knowledge
+        # 서로 다른 모델의 벡터가 섞이지 않도록 한 임베딩 버전의 패턴만 검색
+        self.model_version = model_version
+        # 검색 백엔드: faiss(프로세스 메모리) 또는 pgvector(DB 내부 검색)
+        self.backend = create_knowledge_index(
+            backend or settings.RETRIEVAL_BACKEND, supabase_client, embedding_dim, model_version
+        )
+        # 임베딩 유사도 + pattern_stats 범위 일치도 재정렬
+        self.reranker = StatRangeReranker(settings.HYBRID_ALPHA) if settings.HYBRID_RERANK_ENABLED else None
         self._load_knowledge_base()
         
     def _load_knowledge_base(self):
         """진단 지식베이스 로드"""
-        # DB에서 모든 진단 패턴 로드
-        knowledge_data = self.client.table('diagnosis_knowledge').select("*").execute()
-        
-        vectors = []
-        for idx, knowledge in enumerate(knowledge_data.data):
-            try:
-                # 문자열로 된 임베딩을 파싱
-                if isinstance(knowledge['pattern_embedding'], str):
-                    # 문자열에서 대괄호 제거하고 쉼표로 분리
-                    embedding_str = knowledge['pattern_embedding'].strip('[]')
-                    embedding_list = [float(x) for x in embedding_str.split(',')]
-                    vector = np.array(embedding_list, dtype=np.float32)
-                else:
-                    vector = np.array(knowledge['pattern_embedding'], dtype=np.float32)
-                
-                # 임베딩 벡터 정규화
-                vector = vector / np.linalg.norm(vector)
-                vectors.append(vector)
-                
-                # 지식 맵에 저장
-                self.knowledge_map[idx] = {
-                    "id": knowledge['id'],
-                    "channel": knowledge['channel_name'],
-                    "diagnosis": knowledge['diagnosis_text'],
-                    "severity": knowledge['severity'],
-                    "condition_type": knowledge['condition_type'],
-                    "pattern_stats": knowledge['pattern_stats']
-                }
-            except Exception as e:
-                print(f"Error processing embedding for knowledge {knowledge['id']}: {str(e)}")
-                continue
+        if isinstance(self.backend, PgVectorKnowledgeIndex):
+            print("Using pgvector retrieval backend (knowledge base stays in Postgres)")
+            return
             
-        # FAISS 인덱스에 추가
-        if vectors:
-            self.index.add(np.array(vectors))
-            print(f"Loaded {len(vectors)} diagnosis patterns into RAG")
+        # DB에서 모든 진단 패턴 로드 (PostgREST 최대 행 수에 잘리지 않도록 페이지 단위, 사용하는 컬럼만)
+        def build_query():
+            query = self.client.table('diagnosis_knowledge').select(KNOWLEDGE_COLUMNS).order('id')
+            if self.model_version:
+                query = query.eq('model_version', self.model_version)
+            return query
+
+        rows = fetch_all(build_query)
+        loaded = self.backend.load(rows)
+        if self.reranker is not None:
+            self.reranker.fit(rows)
+        if loaded:
+            print(f"Loaded {loaded} diagnosis patterns into RAG ({self.model_version or 'all versions'})")
+        else:
+            print(f"Warning: no diagnosis patterns found for embedding version {self.model_version}")
             
-    def search_diagnosis(self, sensor_embeddings: Dict[str, np.ndarray], threshold: float = 80.0) -> List[Dict]:
-        """센서 임베딩에 대한 진단 검색"""
-        all_diagnoses = []
+    def search_diagnosis(self, sensor_embeddings: Dict[str, np.ndarray], threshold: float = 80.0,
+                         sensor_stats: Optional[Dict[str, Dict]] = None, k: int = 5) -> List[Dict]:
+        """센서 임베딩에 대한 진단 검색 (sensor_stats가 있으면 통계 범위 일치도로 재정렬)"""
+        candidates = []
         
         for channel, embedding in sensor_embeddings.items():
-            # 쿼리 벡터 정규화
-            query_vector = embedding / np.linalg.norm(embedding)
-            query_vector = query_vector.reshape(1, -1).astype(np.float32)
+            # 채널이 일치하는 패턴 중 유사 패턴 검색 (상위 k개)
+            with profile_section(f"{self.backend.name}_search", channel=channel, k=k):
+                hits = self.backend.search(embedding, k=k, channel=channel)
+            candidates.extend((channel, score, knowledge) for score, knowledge in hits)
             
-            # 유사 패턴 검색 (상위 5개)
-            scores, indices = self.index.search(query_vector, k=5)
+        if not candidates:
+            return []
             
-            # 결과 필터링 및 처리
-            for score, idx in zip(scores[0], indices[0]):
-                similarity = float(score * 100)  # 백분율로 변환
-                
-                if similarity >= threshold:
-                    knowledge = self.knowledge_map.get(int(idx))
-                    
-                    # 채널이 일치하는 경우만 추가
-                    if knowledge and knowledge['channel'] == channel:
-                        all_diagnoses.append({
-                            "channel": channel,
-                            "diagnosis_text": knowledge['diagnosis'],
-                            "severity": knowledge['severity'],
-                            "condition_type": knowledge['condition_type'],
-                            "similarity": similarity,
-                            "pattern_stats": knowledge['pattern_stats']
-                        })
+        similarities = np.array([score for _, score, _ in candidates])
+        stat_scores = np.full(len(candidates), np.nan)
+        scores = similarities
+        if self.reranker is not None and sensor_stats:
+            # 전체 후보를 한 번에 채점
+            with profile_section("hybrid_rerank", candidates=len(candidates)):
+                knowledge_list = [knowledge for _, _, knowledge in candidates]
+                query = self.reranker.query_matrix([sensor_stats.get(channel) for channel, _, _ in candidates])
+                stat_scores = self.reranker.stat_scores(knowledge_list, query)
+                scores = self.reranker.blend(similarities, stat_scores)
+            
+        # 결과 필터링 및 처리
+        all_diagnoses = []
+        for (channel, _, knowledge), score, similarity, stat_score in zip(candidates, scores, similarities, stat_scores):
+            if score * 100 >= threshold:
+                all_diagnoses.append({
+                    "channel": channel,
+                    "diagnosis_text": knowledge['diagnosis'],
+                    "severity": knowledge['severity'],
+                    "condition_type": knowledge['condition_type'],
+                    "similarity": float(score * 100),  # 백분율로 변환 (재정렬 시 혼합 점수)
+                    "embedding_similarity": float(similarity * 100),
+                    "stat_score": None if np.isnan(stat_score) else float(stat_score),
+                    "pattern_stats": knowledge['pattern_stats']
+                })
                         
         # 유사도 기준 정렬
         all_diagnoses.sort(key=lambda x: x['similarity'], reverse=True)
         
         return all_diagnoses
     
-    def log_search_results(self, query_embedding_id: str, diagnoses: List[Dict]):
-        """검색 결과 로깅"""
-        self.client.table('rag_log').insert({
+    def knowledge_count(self) -> int:
+        """검색 대상(현재 임베딩 버전) 진단 패턴 수"""
+        if isinstance(self.backend, PgVectorKnowledgeIndex):
+            query = self.client.table('diagnosis_knowledge').select("id", count="exact").limit(1)
+            if self.model_version:
+                query = query.eq('model_version', self.model_version)
+            return query.execute().count or 0
+        return self.backend.size()
+    
+    def build_log_row(self, query_embedding_id: str, diagnoses: List[Dict], threshold: float = 80.0) -> Dict:
+        """rag_log 행 구성 (threshold: 검색에 실제로 사용한 임계값)"""
+        return {
             "query_embedding_id": query_embedding_id,
             "matched_diagnoses": diagnoses,
-            "threshold": 80.0,
+            "threshold": threshold,
             "matched_count": len(diagnoses)
-        }).execute()
+        }
+    
+    def log_search_results(self, query_embedding_id: str, diagnoses: List[Dict], threshold: float = 80.0):
+        """검색 결과 로깅"""
+        self.client.table('rag_log').insert(
+            self.build_log_row(query_embedding_id, diagnoses, threshold)
+        ).execute()
 
     def search_similar(self, query_embedding: np.ndarray, k: int = 10, threshold: float = 80.0) -> List[Dict]:
         """유사 임베딩 검색"""
         try:
-            # 문자열인 경우 파싱
-            if isinstance(query_embedding, str):
-                # 대괄호 제거 및 쉼표로 분리
-                embedding_str = query_embedding.strip('[]')
-                embedding_list = [float(x) for x in embedding_str.split(',')]
-                query_embedding = np.array(embedding_list, dtype=np.float32)
-            elif isinstance(query_embedding, list):
-                query_embedding = np.array(query_embedding, dtype=np.float32)
+            # 문자열/리스트인 경우 디코딩
+            query_embedding = decode_vector(query_embedding)
                 
-            # 쿼리 벡터 정규화
-            query_vector = query_embedding / np.linalg.norm(query_embedding)
-            query_vector = query_vector.reshape(1, -1).astype(np.float32)
-            
-            # 검색
-            scores, indices = self.index.search(query_vector, k)
+            # 검색 (채널 구분 없이)
+            with profile_section(f"{self.backend.name}_search", k=k):
+                hits = self.backend.search(query_embedding, k)
             
             # 결과 필터링 (유사도 80 이상)
             results = []
-            for score, idx in zip(scores[0], indices[0]):
+            for score, metadata in hits:
                 similarity = float(score * 100)  # 백분율로 변환
                 if similarity >= threshold:
-                    metadata = self.knowledge_map.get(int(idx), {})
                     results.append({
                         "embedding_id": metadata.get("id"),
                         "channel": metadata.get("channel"),
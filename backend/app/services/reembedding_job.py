@@ -0,0 +1,201 @@
+import argparse
+import time
+from typing import Dict, List, Optional
+
+import pandas as pd
+
+from app.config import settings
+from app.services.chronos_embedder import ChronosEmbedder, CHANNELS, embedding_version
+from app.services.diagnosis_knowlege_seeder import DiagnosisKnowledgeSeeder
+from app.utils.db_client import get_supabase_client, fetch_all
+from app.utils.session_archive import SessionArchive
+from app.utils.vector_codec import encode_vector
+
+
+class ReembeddingJob:
+    """새 임베딩 버전으로 저장된 세션과 지식 패턴을 다시 임베딩하는 재개 가능한 배치 작업
+
+    기존 버전 행은 그대로 두고 새 버전 행을 추가하므로, 작업 중에도 서비스는 활성 버전으로 계속 검색하고
+    작업 완료 후 activate_embedding_version으로 한 번에 전환한다.
+    """
+
+    def __init__(self, model_name: str, page_size: int = 200, batch_size: int = 64, throttle_seconds: float = 0.5):
+        self.supabase = get_supabase_client()
+        self.embedder = ChronosEmbedder(model_name, settings.DEVICE, batch_size=batch_size)
+        self.version = self.embedder.model_version
+        self.page_size = page_size
+        self.throttle_seconds = throttle_seconds
+        self.archive = SessionArchive(settings.SESSION_ARCHIVE_DIR) if settings.SESSION_ARCHIVE_DIR else None
+
+    def run(self, sessions: bool = True, knowledge: bool = True, activate: bool = False):
+        """전체 재임베딩 실행 (중단 후 재실행하면 이미 처리된 세션은 건너뜀)"""
+        self._register_version()
+
+        if knowledge:
+            self.reembed_knowledge()
+        if sessions:
+            self.reembed_sessions()
+
+        self._set_status("ready")
+        print(f"Embedding version {self.version} is ready")
+
+        if activate:
+            self.supabase.rpc("activate_embedding_version", {"target_version": self.version}).execute()
+            # 마지막 페이지 처리 후 활성화 전까지 업로드된 세션 보충
+            if sessions:
+                self.reembed_sessions()
+            print(
+                f"Activated embedding version {self.version}. Restart workers, then run with --catch-up "
+                "to embed sessions uploaded by workers still running the previous version"
+            )
+
+    def catch_up(self):
+        """워커 재시작 전 이전 버전으로만 저장된 세션을 대상 버전으로 보충"""
+        self.reembed_sessions()
+        print(f"Caught up sessions for embedding version {self.version}")
+
+    def reembed_knowledge(self):
+        """지식 패턴 재생성 + 재임베딩 (패턴별 Generator 시드가 같아 동일한 합성 데이터를 사용)"""
+        # 전체 행 조회는 PostgREST 최대 행 수에 잘리므로 최대 variant 한 행만 조회 (DESC 정렬에서 NULL이 먼저 오므로 제외)
+        existing = self.supabase.table('diagnosis_knowledge').select("variant").not_.is_(
+            'variant', 'null'
+        ).order('variant', desc=True).limit(1).execute()
+        variants = existing.data[0]["variant"] + 1 if existing.data else 1
+
+        seeder = DiagnosisKnowledgeSeeder(embedder=self.embedder)
+        seeder.seed_knowledge_base(variants=variants)
+
+    def reembed_sessions(self):
+        """완료된 세션을 id 순서로 페이지 단위 처리"""
+        last_id = None
+        processed = 0
+
+        while True:
+            query = self.supabase.table('sensor_data').select("id").eq('status', 'completed').order('id').limit(self.page_size)
+            if last_id is not None:
+                query = query.gt('id', last_id)
+            page = query.execute().data
+            if not page:
+                break
+            last_id = page[-1]['id']
+
+            pending = self._pending_sessions([row['id'] for row in page])
+            if pending:
+                self._reembed_page(pending)
+                processed += len(pending)
+                print(f"Re-embedded {processed} sessions (last id: {last_id})")
+
+            # DB/CPU 부하 조절
+            time.sleep(self.throttle_seconds)
+
+    def _pending_sessions(self, ids: List[str]) -> List[str]:
+        """대상 버전 임베딩이 아직 없는 세션만 선택"""
+        # 세션당 채널 6행이라 한 페이지가 PostgREST 최대 행 수를 넘을 수 있으므로 끝까지 페이지 조회
+        done = fetch_all(lambda: self.supabase.table('embeddings').select("sensor_data_id").in_(
+            'sensor_data_id', ids
+        ).eq('model_version', self.version).order('id'))
+        done_ids = {row['sensor_data_id'] for row in done}
+        return [sensor_data_id for sensor_data_id in ids if sensor_data_id not in done_ids]
+
+    def _load_channels(self, ids: List[str]) -> Dict[str, Dict]:
+        """로컬 아카이브 우선, 없으면 raw_data JSONB에서 채널 데이터 로드"""
+        channels = {}
+        missing = []
+        for sensor_data_id in ids:
+            if self.archive is not None and self.archive.exists(sensor_data_id):
+                channels[sensor_data_id] = self.archive.channels(sensor_data_id)
+            else:
+                missing.append(sensor_data_id)
+
+        if missing:
+            rows = self.supabase.table('sensor_data').select("id, raw_data").in_('id', missing).execute()
+            for row in rows.data:
+                if not row['raw_data']:
+                    continue
+                df = pd.DataFrame(row['raw_data'])
+                channels[row['id']] = {channel: df[channel].to_numpy() for channel in CHANNELS if channel in df.columns}
+        return channels
+
+    def _reembed_page(self, ids: List[str]):
+        """페이지 내 모든 채널을 배치로 임베딩 후 일괄 insert"""
+        channels = self._load_channels(ids)
+        keys = [(sensor_data_id, channel) for sensor_data_id, data in channels.items() for channel in data]
+        if not keys:
+            return
+
+        embeddings, stats = self.embedder.embed_batch([channels[sensor_data_id][channel] for sensor_data_id, channel in keys])
+
+        # 재실행/보충 패스가 겹쳐도 중복 행이 생기지 않도록 (세션, 채널, 버전) 기준 upsert
+        self.supabase.table('embeddings').upsert([
+            {
+                "sensor_data_id": sensor_data_id,
+                "channel_name": channel,
+                "embedding": encode_vector(embedding),
+                "mean_value": channel_stats["mean"],
+                "variance": channel_stats["variance"],
+                "peak_value": channel_stats["peak"],
+                "min_value": channel_stats["min"],
+                "outlier_count": channel_stats["outlier_count"],
+                "zero_crossing_rate": channel_stats["zero_crossing_rate"],
+                "model_version": self.version,
+                "pooling_method": self.embedder.pooling_method
+            }
+            for (sensor_data_id, channel), embedding, channel_stats in zip(keys, embeddings, stats)
+        ], on_conflict="sensor_data_id,channel_name,model_version").execute()
+
+    def _register_version(self):
+        """버전 등록 (이미 있으면 상태 유지)"""
+        existing = self.supabase.table('embedding_versions').select("status").eq('version', self.version).execute()
+        if not existing.data:
+            self.supabase.table('embedding_versions').insert({"version": self.version, "status": "building"}).execute()
+
+    def _set_status(self, status: str):
+        existing = self.supabase.table('embedding_versions').select("status").eq('version', self.version).execute()
+        # 이미 활성화된 버전은 상태를 내리지 않음
+        if existing.data and existing.data[0]['status'] == 'active':
+            return
+        self.supabase.table('embedding_versions').update({"status": status}).eq('version', self.version).execute()
+
+
+def tag_legacy_rows(model_name: str, from_version: Optional[str] = None):
+    """버전 태그가 없는 기존 임베딩/지식 행을 실제 배포된 모델 버전으로 태그 (재임베딩 없음)"""
+    version = embedding_version(model_name)
+    get_supabase_client().rpc("tag_legacy_embedding_version", {
+        "target_version": version,
+        "from_version": from_version
+    }).execute()
+    print(f"Tagged legacy rows as embedding version {version}")
+
+
+def _parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Re-embed stored sessions and knowledge patterns with a new Chronos model")
+    parser.add_argument("--model", default=settings.CHRONOS_MODEL, help="대상 Chronos 모델")
+    parser.add_argument("--page-size", type=int, default=200)
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--throttle", type=float, default=0.5, help="페이지 사이 대기 시간(초)")
+    parser.add_argument("--skip-sessions", action="store_true")
+    parser.add_argument("--skip-knowledge", action="store_true")
+    parser.add_argument("--activate", action="store_true", help="완료 후 검색 버전을 원자적으로 전환")
+    parser.add_argument("--catch-up", action="store_true", help="워커 재시작 후 누락된 세션만 보충 임베딩")
+    parser.add_argument("--tag-legacy", action="store_true", help="버전 태그가 없는 기존 행을 --model 버전으로 태그 (업그레이드 마이그레이션)")
+    parser.add_argument("--from-version", default=None, help="--tag-legacy 시 NULL 대신 이 버전으로 태그된 행을 다시 태그")
+    return parser.parse_args()
+
+
+# 사용 예시
+if __name__ == "__main__":
+    args = _parse_args()
+    if args.tag_legacy:
+        tag_legacy_rows(args.model, args.from_version)
+    else:
+        job = ReembeddingJob(
+            args.model,
+            page_size=args.page_size,
+            batch_size=args.batch_size,
+            throttle_seconds=args.throttle,
+        )
+        if args.catch_up:
+            job.catch_up()
+        else:
+            job.run(sessions=not args.skip_sessions, knowledge=not args.skip_knowledge, activate=args.activate)
+        print("재임베딩 완료!")
@@ -0,0 +1,122 @@
+import asyncio
+import threading
+import time
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+from typing import Dict, Hashable, Tuple
+
+import numpy as np
+
+
+class AdmissionRejected(Exception):
+    """동시 실행/대기열 한도 또는 사용자별 요청 한도 초과로 요청을 즉시 거절"""
+
+    def __init__(self, status_code: int, detail: str, retry_after: float = 1.0):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+        self.retry_after = retry_after
+
+
+class AdmissionLimiter:
+    """엔드포인트별 동시 실행 수 제한 + 제한된 대기열
+
+    대기열이 가득 차면 즉시 503, 대기 시간이 queue_timeout을 넘으면 503으로 거절해
+    폭주 시에도 처리 중인 요청의 지연 시간을 지킨다.
+    """
+
+    def __init__(self, name: str, max_concurrency: int, max_queue: int, queue_timeout: float = 10.0,
+                 wait_window: int = 1000):
+        self.name = name
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self.in_flight = 0
+        self.queued = 0
+        self.admitted = 0
+        self.rejected_queue_full = 0
+        self.rejected_timeout = 0
+        self._waits = deque(maxlen=wait_window)  # 최근 대기 시간(ms)
+
+    @asynccontextmanager
+    async def slot(self):
+        """실행 슬롯 획득 (대기 포함), 종료 시 반환"""
+        started = time.perf_counter()
+        if not self._semaphore.locked():
+            # 여유 슬롯이 있으면 대기 없이 바로 획득
+            await self._semaphore.acquire()
+        else:
+            if self.queued >= self.max_queue:
+                self.rejected_queue_full += 1
+                raise AdmissionRejected(503, f"{self.name} is overloaded, please retry later", self.queue_timeout)
+
+            self.queued += 1
+            try:
+                await asyncio.wait_for(self._semaphore.acquire(), timeout=self.queue_timeout)
+            except asyncio.TimeoutError:
+                self.rejected_timeout += 1
+                raise AdmissionRejected(503, f"{self.name} queue wait timed out, please retry later", self.queue_timeout)
+            finally:
+                self.queued -= 1
+
+        self._waits.append((time.perf_counter() - started) * 1000)
+        self.admitted += 1
+        self.in_flight += 1
+        try:
+            yield
+        finally:
+            self.in_flight -= 1
+            self._semaphore.release()
+
+    def metrics(self) -> Dict:
+        """현재 부하와 최근 대기 시간 분포"""
+        waits = np.array(self._waits) if self._waits else np.zeros(1)
+        return {
+            "max_concurrency": self.max_concurrency,
+            "max_queue": self.max_queue,
+            "in_flight": self.in_flight,
+            "queued": self.queued,
+            "admitted": self.admitted,
+            "rejected_queue_full": self.rejected_queue_full,
+            "rejected_timeout": self.rejected_timeout,
+            "queue_wait_ms": {
+                "p50": float(np.percentile(waits, 50)),
+                "p95": float(np.percentile(waits, 95)),
+                "max": float(waits.max()),
+                "mean": float(waits.mean()),
+            },
+        }
+
+
+class TokenBucketLimiter:
+    """키(user_id 또는 클라이언트 IP)별 토큰 버킷 (rate_per_minute로 채워지고 burst까지 누적)"""
+
+    def __init__(self, rate_per_minute: float, burst: int, max_keys: int = 10000):
+        self.rate = rate_per_minute / 60.0
+        self.burst = burst
+        self.max_keys = max_keys
+        self.rejected = 0
+        self._buckets: "OrderedDict[Hashable, Tuple[float, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def acquire(self, key: Hashable):
+        """토큰 하나 소비, 부족하면 429 AdmissionRejected"""
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated_at = self._buckets.pop(key, (float(self.burst), now))
+            tokens = min(self.burst, tokens + (now - updated_at) * self.rate)
+            allowed = tokens >= 1
+            if allowed:
+                tokens -= 1
+            self._buckets[key] = (tokens, now)
+            # 오래 사용되지 않은 키부터 제거
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+
+        if not allowed:
+            self.rejected += 1
+            raise AdmissionRejected(429, "Rate limit exceeded", (1 - tokens) / self.rate if self.rate > 0 else 60.0)
+
+    def metrics(self) -> Dict:
+        return {"tracked_keys": len(self._buckets), "rejected": self.rejected}
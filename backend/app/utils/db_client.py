@@ -1,5 +1,31 @@
+from typing import Callable, Dict, List, Optional
 from supabase import create_client, Client
 from app.config import settings
 
 def get_supabase_client() -> Client:
     return create_client(settings.SUPABASE_URL, settings.SUPABASE_KEY)
+
+def get_active_embedding_version(client: Client) -> Optional[str]:
+    """현재 검색에 사용 중인 임베딩 버전 (등록된 버전이 없으면 None)"""
+    try:
+        result = client.table('embedding_versions').select("version").eq('status', 'active').limit(1).execute()
+    except Exception:
+        return None
+    return result.data[0]['version'] if result.data else None
+
+def get_active_model_name(client: Client) -> str:
+    """활성 임베딩 버전(모델:풀링)의 Chronos 모델 (등록된 버전이 없으면 CHRONOS_MODEL)"""
+    active_version = get_active_embedding_version(client)
+    return active_version.rpartition(":")[0] if active_version else settings.CHRONOS_MODEL
+
+def fetch_all(build_query: Callable, page_size: int = 1000) -> List[Dict]:
+    """PostgREST 최대 행 수(기본 1000) 제한을 넘는 조회를 .range()로 페이지 단위 수집
+
+    build_query는 매 페이지마다 새 쿼리를 만들어야 하며 정렬(order)이 고정되어 있어야 한다.
+    """
+    rows = []
+    while True:
+        page = build_query().range(len(rows), len(rows) + page_size - 1).execute().data
+        rows.extend(page)
+        if len(page) < page_size:
+            return rows
@@ -0,0 +1,170 @@
+import json
+import logging
+from typing import Dict, List, Optional
+
+from app.config import settings
+from app.utils.vector_codec import decode_vector_binary, encode_vector_binary
+
+try:
+    import asyncpg
+except ImportError:  # asyncpg 미설치 시 Supabase REST 경로만 사용
+    asyncpg = None
+
+logger = logging.getLogger(__name__)
+
+# 핫패스 쿼리 (asyncpg가 커넥션별로 prepared statement로 캐싱)
+INSERT_EMBEDDING_SQL = """
+    INSERT INTO embeddings (
+        sensor_data_id, channel_name, embedding, mean_value, variance,
+        peak_value, min_value, outlier_count, zero_crossing_rate, model_version, pooling_method
+    ) VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9, $10, $11)
+"""
+
+SELECT_EMBEDDINGS_SQL = """
+    SELECT e.id, e.sensor_data_id, e.channel_name, e.embedding, e.mean_value, e.variance,
+           e.peak_value, e.min_value, e.outlier_count, e.zero_crossing_rate, e.created_at,
+           sd.gait_features
+    FROM embeddings e
+    JOIN sensor_data sd ON sd.id = e.sensor_data_id
+    WHERE e.sensor_data_id = $1 AND e.model_version = $2
+"""
+
+INSERT_DIAGNOSIS_SQL = """
+    INSERT INTO diagnosis (
+        sensor_data_id, user_id, overall_diagnosis, severity_level, recommendations,
+        used_embeddings, system_prompt, diagnosis_path, accx_diagnosis, accy_diagnosis,
+        accz_diagnosis, gyrx_diagnosis, gyry_diagnosis, gyrz_diagnosis
+    ) VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9, $10, $11, $12, $13, $14)
+    RETURNING id, created_at
+"""
+
+INSERT_RAG_LOG_SQL = """
+    INSERT INTO rag_log (query_embedding_id, matched_diagnoses, threshold, matched_count)
+    VALUES ($1, $2, $3, $4)
+"""
+
+DIAGNOSIS_CHANNEL_COLUMNS = [
+    "accx_diagnosis", "accy_diagnosis", "accz_diagnosis",
+    "gyrx_diagnosis", "gyry_diagnosis", "gyrz_diagnosis",
+]
+
+
+async def _init_connection(conn):
+    """커넥션별 타입 코덱 등록 (vector는 바이너리, jsonb는 dict로 주고받음)"""
+    await conn.set_type_codec(
+        'jsonb', encoder=json.dumps, decoder=json.loads, schema='pg_catalog'
+    )
+    # Supabase는 pgvector를 extensions 스키마에 설치하는 경우가 있어 스키마를 조회
+    vector_schema = await conn.fetchval(
+        "SELECT typnamespace::regnamespace::text FROM pg_type WHERE typname = 'vector' LIMIT 1"
+    )
+    await conn.set_type_codec(
+        'vector', encoder=encode_vector_binary, decoder=decode_vector_binary,
+        schema=vector_schema or 'public', format='binary'
+    )
+
+
+class PostgresPool:
+    """Supabase REST 대신 Postgres에 직접 연결하는 핫패스 쿼리 레이어"""
+
+    def __init__(self, dsn: str, min_size: int = 1, max_size: int = 10):
+        if asyncpg is None:
+            raise ImportError("asyncpg is required for direct Postgres access")
+        self.dsn = dsn
+        self.min_size = min_size
+        self.max_size = max_size
+        self.pool = None
+
+    async def connect(self):
+        """커넥션 풀 생성"""
+        self.pool = await asyncpg.create_pool(
+            self.dsn,
+            min_size=self.min_size,
+            max_size=self.max_size,
+            init=_init_connection,
+        )
+        logger.info(f"Postgres pool created (min={self.min_size}, max={self.max_size})")
+
+    async def close(self):
+        """커넥션 풀 종료"""
+        if self.pool is not None:
+            await self.pool.close()
+            self.pool = None
+
+    async def insert_embeddings(self, sensor_data_id: str, embeddings: Dict, model_version: str, pooling_method: str = "mean"):
+        """채널별 임베딩 일괄 insert (임베딩 버전 태그 포함)"""
+        rows = [
+            (
+                sensor_data_id,
+                channel,
+                data["embedding"],
+                data["stats"]["mean"],
+                data["stats"]["variance"],
+                data["stats"]["peak"],
+                data["stats"]["min"],
+                data["stats"]["outlier_count"],
+                data["stats"]["zero_crossing_rate"],
+                model_version,
+                pooling_method,
+            )
+            for channel, data in embeddings.items()
+        ]
+        async with self.pool.acquire() as conn:
+            await conn.executemany(INSERT_EMBEDDING_SQL, rows)
+
+    async def fetch_embeddings(self, sensor_data_id: str, model_version: str) -> List[Dict]:
+        """센서 데이터의 특정 버전 임베딩 조회 (Supabase 응답과 동일한 dict 형태)"""
+        async with self.pool.acquire() as conn:
+            records = await conn.fetch(SELECT_EMBEDDINGS_SQL, sensor_data_id, model_version)
+        results = []
+        for record in records:
+            row = dict(record)
+            row['id'] = str(row['id'])
+            row['sensor_data_id'] = str(row['sensor_data_id'])
+            results.append(row)
+        return results
+
+    async def insert_diagnosis(self, row: Dict) -> Dict:
+        """진단 결과 insert 후 id, created_at 반환"""
+        async with self.pool.acquire() as conn:
+            record = await conn.fetchrow(
+                INSERT_DIAGNOSIS_SQL,
+                row["sensor_data_id"],
+                row.get("user_id"),
+                row["overall_diagnosis"],
+                row["severity_level"],
+                row["recommendations"],
+                row["used_embeddings"],
+                row["system_prompt"],
+                row.get("diagnosis_path", "llm"),
+                *[row.get(column) for column in DIAGNOSIS_CHANNEL_COLUMNS],
+            )
+        return {"id": str(record["id"]), "created_at": record["created_at"]}
+
+    async def insert_rag_log(self, query_embedding_id: str, diagnoses: List[Dict], threshold: float = 80.0):
+        """RAG 검색 로그 insert"""
+        async with self.pool.acquire() as conn:
+            await conn.execute(
+                INSERT_RAG_LOG_SQL, query_embedding_id, diagnoses, threshold, len(diagnoses)
+            )
+
+    async def insert_many(self, table: str, rows: List[Dict]):
+        """임의 테이블 일괄 insert (컬럼은 첫 행의 키 기준, write-behind 큐에서 사용)"""
+        if not rows:
+            return
+        columns = list(rows[0].keys())
+        placeholders = ", ".join(f"${i + 1}" for i in range(len(columns)))
+        sql = f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({placeholders})"
+        async with self.pool.acquire() as conn:
+            await conn.executemany(sql, [tuple(row.get(column) for column in columns) for row in rows])
+
+
+def get_postgres_pool() -> Optional[PostgresPool]:
+    """설정에 따라 직접 연결 풀 생성 (비활성화 시 None)"""
+    if not settings.USE_DIRECT_DB or not settings.SUPABASE_DB_URL:
+        return None
+    return PostgresPool(
+        settings.SUPABASE_DB_URL,
+        min_size=settings.DB_POOL_MIN_SIZE,
+        max_size=settings.DB_POOL_MAX_SIZE,
+    )
@@ -0,0 +1,220 @@
+import cProfile
+import contextvars
+import json
+import random
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+# 현재 요청의 프로파일 세션 (contextvars라 asyncio 태스크/to_thread에도 전파됨)
+_current_profile: contextvars.ContextVar = contextvars.ContextVar("current_profile", default=None)
+
+# cProfile은 스레드당 하나만 활성화 가능
+_cprofile_lock = threading.Lock()
+
+
+# 대기 중인 스레드의 최상단 프레임 파일 (샘플에서 제외)
+IDLE_FRAME_FILES = {"threading.py", "queue.py", "selectors.py"}
+
+
+class StackSampler:
+    """모든 스레드(이벤트 루프 + to_thread 워커)의 스택을 주기적으로 샘플링해
+    collapsed stack(flamegraph.pl/speedscope 형식)으로 집계"""
+
+    def __init__(self, interval: float = 0.005):
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        names = {}
+        while not self._stop.wait(self.interval):
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == self._thread.ident or Path(frame.f_code.co_filename).name in IDLE_FRAME_FILES:
+                    continue
+                if thread_id not in names:
+                    names = {thread.ident: thread.name for thread in threading.enumerate()}
+                frames = []
+                while frame is not None:
+                    code = frame.f_code
+                    frames.append(f"{code.co_name} ({Path(code.co_filename).name}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                frames.append(names.get(thread_id, str(thread_id)))
+                self.stacks[";".join(reversed(frames))] += 1
+
+    def collapsed(self) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+
+class ProfileSession:
+    """요청 하나의 프로파일 결과 (cProfile 또는 샘플링 스택 + 구간별 타이밍 + torch trace)"""
+
+    def __init__(self, output_dir: Path, name: str, mode: str, torch_enabled: bool):
+        self.output_dir = output_dir
+        self.prefix = f"{datetime.utcnow().strftime('%Y%m%dT%H%M%S')}_{name}_{uuid.uuid4().hex[:8]}"
+        self.mode = mode
+        self.torch_enabled = torch_enabled
+        self.timings: List[Dict] = []
+        self.torch_traces: List[str] = []
+        self._profile: Optional[cProfile.Profile] = None
+        self._sampler: Optional[StackSampler] = None
+        self._started = 0.0
+
+    def start(self):
+        self._started = time.perf_counter()
+        if self.mode == "cprofile":
+            # 다른 요청이 프로파일링 중이면 cProfile 없이 타이밍만 기록
+            # cProfile은 이 스레드(이벤트 루프)만 측정하므로 to_thread 워커의 CPU 작업은 .prof에 나오지 않음 (sampling 모드 사용)
+            if _cprofile_lock.acquire(blocking=False):
+                self._profile = cProfile.Profile()
+                self._profile.enable()
+        elif self.mode == "sampling":
+            self._sampler = StackSampler()
+            self._sampler.start()
+
+    def stop(self):
+        if self._profile is not None:
+            self._profile.disable()
+            _cprofile_lock.release()
+        if self._sampler is not None:
+            self._sampler.stop()
+
+    def record(self, name: str, duration_ms: float, **extra):
+        self.timings.append({"name": name, "duration_ms": round(duration_ms, 3), **extra})
+
+    def trace_path(self, name: str) -> Path:
+        path = self.output_dir / f"{self.prefix}.{name}.{len(self.torch_traces)}.trace.json"
+        self.torch_traces.append(path.name)
+        return path
+
+    def write(self, meta: Dict):
+        """결과 파일 저장: .prof(pstats), .collapsed(접힌 스택), .timings.json"""
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        if self._profile is not None:
+            self._profile.dump_stats(self.output_dir / f"{self.prefix}.prof")
+        if self._sampler is not None:
+            (self.output_dir / f"{self.prefix}.collapsed").write_text(self._sampler.collapsed())
+
+        summary = {
+            **meta,
+            "total_ms": round((time.perf_counter() - self._started) * 1000, 3),
+            "mode": self.mode,
+            "timings": self.timings,
+            "torch_traces": self.torch_traces,
+        }
+        (self.output_dir / f"{self.prefix}.timings.json").write_text(json.dumps(summary, indent=2))
+
+
+class RequestProfiler:
+    """설정값(샘플링 비율) 또는 요청 헤더로 켜지는 요청 단위 프로파일러"""
+
+    def __init__(self, output_dir: str, sample_rate: float = 0.0, mode: str = "sampling", torch_enabled: bool = True):
+        self.output_dir = Path(output_dir)
+        self.sample_rate = sample_rate
+        self.mode = mode
+        self.torch_enabled = torch_enabled
+
+    def should_profile(self, forced: bool = False) -> bool:
+        return forced or (self.sample_rate > 0 and random.random() < self.sample_rate)
+
+    def begin(self, name: str):
+        """프로파일 세션 시작 (반환된 토큰으로 end 호출)"""
+        session = ProfileSession(self.output_dir, name, self.mode, self.torch_enabled)
+        token = _current_profile.set(session)
+        session.start()
+        return session, token
+
+    def end(self, session: ProfileSession, token, meta: Dict):
+        session.stop()
+        _current_profile.reset(token)
+        try:
+            session.write(meta)
+        except Exception as e:
+            print(f"Warning: Failed to write profile {session.prefix}: {str(e)}")
+
+
+class ProfilingMiddleware:
+    """샘플링되거나 X-Profile 헤더가 붙은 요청의 프로파일을 저장하는 ASGI 미들웨어"""
+
+    def __init__(self, app, profiler: RequestProfiler, paths: Iterable[str], allow_header: bool = False):
+        self.app = app
+        self.profiler = profiler
+        self.paths = set(paths)
+        self.allow_header = allow_header
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] not in self.paths:
+            return await self.app(scope, receive, send)
+
+        forced = self.allow_header and (b"x-profile", b"1") in scope.get("headers", [])
+        if not self.profiler.should_profile(forced):
+            return await self.app(scope, receive, send)
+
+        session, token = self.profiler.begin(scope["path"].strip("/"))
+        status_code = 500
+
+        async def send_with_profile_id(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                message = {**message, "headers": [*message.get("headers", []), (b"x-profile-id", session.prefix.encode())]}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_profile_id)
+        finally:
+            self.profiler.end(session, token, {
+                "method": scope["method"],
+                "path": scope["path"],
+                "status_code": status_code,
+                "forced": forced
+            })
+
+
+@contextmanager
+def profile_section(name: str, **extra):
+    """프로파일링 중인 요청이면 구간 실행 시간 기록 (아니면 오버헤드 없음)"""
+    session = _current_profile.get()
+    if session is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        session.record(name, (time.perf_counter() - started) * 1000, **extra)
+
+
+@contextmanager
+def torch_trace(name: str):
+    """프로파일링 중인 요청이면 torch profiler로 감싸 chrome trace(.trace.json) 저장"""
+    session = _current_profile.get()
+    if session is None or not session.torch_enabled:
+        yield
+        return
+
+    import torch
+    from torch.profiler import profile, ProfilerActivity
+
+    activities = [ProfilerActivity.CPU]
+    if torch.cuda.is_available():
+        activities.append(ProfilerActivity.CUDA)
+
+    with profile(activities=activities, record_shapes=True) as prof:
+        yield
+    session.output_dir.mkdir(parents=True, exist_ok=True)
+    prof.export_chrome_trace(str(session.trace_path(name)))
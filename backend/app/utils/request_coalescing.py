@@ -0,0 +1,57 @@
+import asyncio
+import time
+import threading
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple
+
+
+class SingleFlight:
+    """같은 키로 동시에 들어온 요청이 하나의 진행 중인 작업을 공유하도록 묶음"""
+
+    def __init__(self):
+        self._inflight: Dict[Hashable, asyncio.Task] = {}
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(fn())
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        # 한 요청이 끊겨도 공유 작업은 취소되지 않도록 shield
+        return await asyncio.shield(task)
+
+    def __len__(self) -> int:
+        return len(self._inflight)
+
+
+class TTLResultCache:
+    """키별 최근 결과를 지문(fingerprint)과 함께 짧게 보관하는 캐시"""
+
+    def __init__(self, ttl_seconds: float = 60, max_entries: int = 1024):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries: Dict[Hashable, Tuple[float, Hashable, Any]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, fingerprint: Hashable) -> Optional[Any]:
+        """지문이 같고 만료되지 않은 결과만 반환"""
+        if self.ttl_seconds <= 0:
+            return None
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            stored_at, stored_fingerprint, value = entry
+            if time.monotonic() - stored_at > self.ttl_seconds or stored_fingerprint != fingerprint:
+                del self._entries[key]
+                return None
+            return value
+
+    def put(self, key: Hashable, fingerprint: Hashable, value: Any):
+        if self.ttl_seconds <= 0:
+            return
+        with self._lock:
+            if len(self._entries) >= self.max_entries:
+                # 가장 오래된 항목 제거
+                oldest = min(self._entries, key=lambda k: self._entries[k][0])
+                del self._entries[oldest]
+            self._entries[key] = (time.monotonic(), fingerprint, value)
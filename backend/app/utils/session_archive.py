@@ -0,0 +1,73 @@
+import json
+import os
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+CHANNELS = ['AccX', 'AccY', 'AccZ', 'GyrX', 'GyrY', 'GyrZ']
+
+
+class SessionArchive:
+    """sensor_data_id별 원본 채널을 float32 raw 파일로 저장하고 memmap으로 읽는 로컬 컬럼형 아카이브
+
+    레이아웃: <root>/<id 앞 2자리>/<id>.f32 (채널별로 연속된 [C, L] 행렬) + <id>.json (헤더)
+    """
+
+    def __init__(self, root_dir: str):
+        self.root = Path(root_dir)
+
+    def _paths(self, sensor_data_id: str):
+        # UUID 형식만 허용 (경로 조작 방지)
+        if not sensor_data_id or not sensor_data_id.replace('-', '').isalnum():
+            raise ValueError(f"Invalid sensor_data_id: {sensor_data_id}")
+        directory = self.root / sensor_data_id[:2]
+        return directory / f"{sensor_data_id}.f32", directory / f"{sensor_data_id}.json"
+
+    def exists(self, sensor_data_id: str) -> bool:
+        data_path, header_path = self._paths(sensor_data_id)
+        return data_path.exists() and header_path.exists()
+
+    def write(self, sensor_data_id: str, df: pd.DataFrame, channels: List[str] = CHANNELS):
+        """업로드 데이터 저장 (임시 파일에 쓴 뒤 원자적으로 교체)"""
+        channels = [channel for channel in channels if channel in df.columns]
+        data_path, header_path = self._paths(sensor_data_id)
+        data_path.parent.mkdir(parents=True, exist_ok=True)
+
+        matrix = np.ascontiguousarray(df[channels].to_numpy(dtype=np.float32).T)
+        tmp_path = data_path.with_suffix(".f32.tmp")
+        matrix.tofile(tmp_path)
+        os.replace(tmp_path, data_path)
+
+        header = {"channels": channels, "row_count": int(matrix.shape[1]), "dtype": "float32"}
+        tmp_path = header_path.with_suffix(".json.tmp")
+        tmp_path.write_text(json.dumps(header))
+        os.replace(tmp_path, header_path)
+
+    def header(self, sensor_data_id: str) -> Dict:
+        _, header_path = self._paths(sensor_data_id)
+        return json.loads(header_path.read_text())
+
+    def open(self, sensor_data_id: str) -> np.memmap:
+        """[C, L] 읽기 전용 memmap (필요한 페이지만 디스크에서 읽음)"""
+        data_path, _ = self._paths(sensor_data_id)
+        header = self.header(sensor_data_id)
+        return np.memmap(
+            data_path, dtype=np.float32, mode="r",
+            shape=(len(header["channels"]), header["row_count"])
+        )
+
+    def channel(self, sensor_data_id: str, channel: str,
+                start: Optional[int] = None, stop: Optional[int] = None, step: Optional[int] = None) -> np.ndarray:
+        """채널 구간 슬라이스 (복사 없는 view)"""
+        header = self.header(sensor_data_id)
+        if channel not in header["channels"]:
+            raise KeyError(f"Channel {channel} not in archive for {sensor_data_id}")
+        return self.open(sensor_data_id)[header["channels"].index(channel), start:stop:step]
+
+    def channels(self, sensor_data_id: str) -> Dict[str, np.ndarray]:
+        """모든 채널 view (재임베딩용)"""
+        header = self.header(sensor_data_id)
+        matrix = self.open(sensor_data_id)
+        return {channel: matrix[i] for i, channel in enumerate(header["channels"])}
@@ -0,0 +1,25 @@
+import math
+from functools import lru_cache
+
+try:
+    import tiktoken
+except ImportError:  # tiktoken 미설치 시 글자 수 기반 근사치 사용
+    tiktoken = None
+
+
+@lru_cache(maxsize=8)
+def _encoding(model_name: str):
+    try:
+        return tiktoken.encoding_for_model(model_name)
+    except KeyError:
+        return tiktoken.get_encoding("cl100k_base")
+
+
+def count_tokens(text: str, model_name: str = "gpt-4") -> int:
+    """로컬 토크나이저로 토큰 수 계산 (네트워크 호출 없음)"""
+    if not text:
+        return 0
+    if tiktoken is None:
+        # 영문 기준 토큰당 약 4글자
+        return math.ceil(len(text) / 4)
+    return len(_encoding(model_name).encode(text))
@@ -0,0 +1,43 @@
+import struct
+import numpy as np
+from typing import Union, List
+
+# pgvector 바이너리 포맷 헤더: dim(int16) + unused(int16), 이후 big-endian float32
+_PGVECTOR_HEADER = struct.Struct(">HH")
+_PGVECTOR_DTYPE = np.dtype(">f4")
+
+VectorLike = Union[str, bytes, bytearray, memoryview, List[float], np.ndarray]
+
+
+def decode_vector(value: VectorLike) -> np.ndarray:
+    """pgvector 값(텍스트 '[...]', 바이너리, 리스트)을 float32 배열로 변환"""
+    if isinstance(value, np.ndarray):
+        return value.astype(np.float32, copy=False)
+
+    if isinstance(value, str):
+        # 텍스트 포맷: Python float 객체를 거치지 않고 C 레벨에서 바로 파싱
+        return np.fromstring(value.strip().strip('[]'), dtype=np.float32, sep=',')
+
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return decode_vector_binary(value)
+
+    return np.asarray(value, dtype=np.float32)
+
+
+def decode_vector_binary(value: Union[bytes, bytearray, memoryview]) -> np.ndarray:
+    """pgvector 바이너리 포맷 디코딩"""
+    dim, _ = _PGVECTOR_HEADER.unpack_from(value, 0)
+    vector = np.frombuffer(value, dtype=_PGVECTOR_DTYPE, count=dim, offset=_PGVECTOR_HEADER.size)
+    return vector.astype(np.float32)
+
+
+def encode_vector(vector: Union[np.ndarray, List[float]]) -> str:
+    """pgvector 텍스트 포맷으로 인코딩 (유효숫자 9자리: float32 값이 그대로 복원됨)"""
+    vector = np.asarray(vector, dtype=np.float32).ravel()
+    return '[' + ','.join(['%.9g'] * len(vector)) % tuple(vector.tolist()) + ']'
+
+
+def encode_vector_binary(vector: Union[np.ndarray, List[float]]) -> bytes:
+    """pgvector 바이너리 포맷으로 인코딩"""
+    vector = np.asarray(vector, dtype=_PGVECTOR_DTYPE).ravel()
+    return _PGVECTOR_HEADER.pack(len(vector), 0) + vector.tobytes()
@@ -0,0 +1,187 @@
+import asyncio
+import json
+import logging
+import os
+import time
+from collections import defaultdict
+from datetime import datetime
+from pathlib import Path
+from typing import Awaitable, Callable, Dict, Iterable, List, Optional
+
+from supabase import Client
+
+logger = logging.getLogger(__name__)
+
+# (table, rows) -> 일괄 insert
+TableWriter = Callable[[str, List[Dict]], Awaitable[None]]
+
+
+def make_table_writer(supabase_client: Client, pg_pool=None) -> TableWriter:
+    """직접 연결 풀이 있으면 asyncpg, 없으면 Supabase REST로 일괄 insert"""
+
+    async def write(table: str, rows: List[Dict]):
+        if pg_pool is not None:
+            await pg_pool.insert_many(table, rows)
+            return
+        # datetime 등 JSON 비호환 값은 문자열로 변환
+        payload = json.loads(json.dumps(rows, default=str))
+        await asyncio.to_thread(lambda: supabase_client.table(table).insert(payload).execute())
+
+    return write
+
+
+def _encode_spill(value):
+    if isinstance(value, datetime):
+        return {"$datetime": value.isoformat()}
+    return str(value)
+
+
+def _decode_spill(obj: Dict):
+    if set(obj) == {"$datetime"}:
+        return datetime.fromisoformat(obj["$datetime"])
+    return obj
+
+
+class WriteBehindQueue:
+    """감사/로그성 insert를 응답 경로 밖에서 모아서 기록하는 백그라운드 큐
+
+    durable_tables의 행은 재시도가 모두 실패해도 버리지 않고 spill_dir에 JSONL로 남겨 다음 시작 시 다시 기록한다.
+    """
+
+    def __init__(
+        self,
+        writer: TableWriter,
+        max_size: int = 1000,
+        batch_size: int = 50,
+        flush_interval: float = 1.0,
+        max_retries: int = 5,
+        base_backoff: float = 0.5,
+        spill_dir: Optional[str] = None,
+        durable_tables: Iterable[str] = ("diagnosis",),
+    ):
+        self.writer = writer
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=max_size)
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_retries = max_retries
+        self.base_backoff = base_backoff
+        self.spill_dir = Path(spill_dir) if spill_dir else None
+        self.durable_tables = set(durable_tables)
+        self.dropped_count = 0
+        self.spilled_count = 0
+        self._worker: Optional[asyncio.Task] = None
+        self._replay: Optional[asyncio.Task] = None
+        self._closing = False
+
+    def start(self):
+        """백그라운드 flush 태스크 시작"""
+        if self._worker is None:
+            self._worker = asyncio.create_task(self._run())
+            self._replay = asyncio.create_task(self._replay_spilled())
+
+    async def submit(self, table: str, row: Dict, block: bool = False, timeout: Optional[float] = None) -> bool:
+        """행 예약. 큐가 가득 차면 block=False는 버리고, block=True는 최대 timeout초 대기 후 False 반환"""
+        if self._closing:
+            await self._write_with_retry(table, [row])
+            return True
+        if block:
+            try:
+                await asyncio.wait_for(self.queue.put((table, row)), timeout=timeout)
+                return True
+            except asyncio.TimeoutError:
+                logger.warning(f"Write-behind queue full, timed out waiting to enqueue {table} row")
+                return False
+        try:
+            self.queue.put_nowait((table, row))
+            return True
+        except asyncio.QueueFull:
+            self.dropped_count += 1
+            logger.warning(f"Write-behind queue full, dropped {table} row (total dropped: {self.dropped_count})")
+            return False
+
+    async def close(self):
+        """남은 행을 모두 기록하고 종료 (shutdown 시 호출)"""
+        self._closing = True
+        if self._replay is not None:
+            await self._replay
+            self._replay = None
+        if self._worker is not None:
+            await self._worker
+            self._worker = None
+        while not self.queue.empty():
+            await self._flush(self._drain())
+
+    def _drain(self, first=None) -> List:
+        """큐에서 최대 batch_size개 꺼내기"""
+        items = [first] if first is not None else []
+        while len(items) < self.batch_size:
+            try:
+                items.append(self.queue.get_nowait())
+            except asyncio.QueueEmpty:
+                break
+        return items
+
+    async def _run(self):
+        # 종료 요청 후에는 큐가 빌 때까지 flush하고 빠져나감
+        while not (self._closing and self.queue.empty()):
+            try:
+                first = await asyncio.wait_for(self.queue.get(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                continue
+            await self._flush(self._drain(first))
+
+    async def _flush(self, items: List):
+        """테이블별로 묶어서 일괄 기록"""
+        grouped = defaultdict(list)
+        for table, row in items:
+            grouped[table].append(row)
+        for table, rows in grouped.items():
+            await self._write_with_retry(table, rows)
+
+    async def _write_with_retry(self, table: str, rows: List[Dict]):
+        """지수 백오프 재시도, 모두 실패하면 durable 테이블은 디스크에 남기고 나머지는 로그를 남기고 버림"""
+        for attempt in range(self.max_retries):
+            try:
+                await self.writer(table, rows)
+                return
+            except Exception as e:
+                delay = self.base_backoff * (2 ** attempt)
+                logger.warning(
+                    f"Write-behind insert into {table} failed "
+                    f"(attempt {attempt + 1}/{self.max_retries}): {str(e)}"
+                )
+                if attempt + 1 < self.max_retries:
+                    await asyncio.sleep(delay)
+        if table in self.durable_tables and self.spill_dir is not None:
+            try:
+                self._spill(table, rows)
+                self.spilled_count += len(rows)
+                logger.error(f"Spilled {len(rows)} {table} rows to {self.spill_dir} after {self.max_retries} attempts")
+                return
+            except Exception as e:
+                logger.error(f"Failed to spill {table} rows: {str(e)}")
+        self.dropped_count += len(rows)
+        logger.error(f"Giving up on {len(rows)} {table} rows after {self.max_retries} attempts")
+
+    def _spill(self, table: str, rows: List[Dict]):
+        """기록 실패한 행을 <spill_dir>/<table>.jsonl에 추가 (fsync)"""
+        self.spill_dir.mkdir(parents=True, exist_ok=True)
+        with open(self.spill_dir / f"{table}.jsonl", "a", encoding="utf-8") as f:
+            for row in rows:
+                f.write(json.dumps(row, default=_encode_spill) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+    async def _replay_spilled(self):
+        """이전 실행에서 디스크에 남긴 행 재기록 (다시 실패하면 새 spill 파일로 돌아감)"""
+        if self.spill_dir is None or not self.spill_dir.exists():
+            return
+        for path in sorted(self.spill_dir.glob("*.jsonl")):
+            replay_path = path.with_name(f"{path.stem}.{int(time.time() * 1000)}.replay")
+            os.replace(path, replay_path)
+            with open(replay_path, encoding="utf-8") as f:
+                rows = [json.loads(line, object_hook=_decode_spill) for line in f if line.strip()]
+            for start in range(0, len(rows), self.batch_size):
+                await self._write_with_retry(path.stem, rows[start:start + self.batch_size])
+            replay_path.unlink()
+            logger.info(f"Replayed {len(rows)} spilled {path.stem} rows")
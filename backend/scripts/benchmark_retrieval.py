@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+RAG 검색 백엔드 벤치마크 (FAISS vs pgvector)
+지식베이스 크기별로 검색 지연시간과 워커당 메모리 사용량을 비교합니다.
+
+사용 예시:
+    cd backend
+    python scripts/benchmark_retrieval.py --sizes 1000 10000 100000
+    python scripts/benchmark_retrieval.py --sizes 1000 10000 --pgvector  # 합성 행을 벤치마크 전용 테이블에 넣고 측정 후 삭제
+
+--pgvector 사용 전 scripts/benchmark_schema.sql 실행 필요 (실서비스 diagnosis_knowledge는 건드리지 않음)
+"""
+
+import argparse
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.services.knowledge_index import FaissKnowledgeIndex, PgVectorKnowledgeIndex
+from app.utils.vector_codec import encode_vector
+
+CHANNELS = ['AccX', 'AccY', 'AccZ', 'GyrX', 'GyrY', 'GyrZ']
+BENCHMARK_CONDITION = "benchmark_synthetic"
+BENCHMARK_TABLE = "diagnosis_knowledge_benchmark"
+BENCHMARK_FUNCTION = "match_diagnosis_knowledge_benchmark"
+
+
+def make_rows(size: int, dim: int, rng: np.random.Generator):
+    """합성 diagnosis_knowledge 행 생성"""
+    vectors = rng.standard_normal((size, dim)).astype(np.float32)
+    rows = []
+    for i in range(size):
+        rows.append({
+            "id": f"synthetic-{i}",
+            "pattern_embedding": vectors[i],
+            "channel_name": CHANNELS[i % len(CHANNELS)],
+            "diagnosis_text": f"Synthetic pattern {i}",
+            "severity": "normal",
+            "condition_type": BENCHMARK_CONDITION,
+            "pattern_stats": {}
+        })
+    return rows
+
+
+def time_queries(index, queries: np.ndarray, k: int):
+    """채널 필터 검색 지연시간(ms) 측정"""
+    latencies = []
+    for i, query in enumerate(queries):
+        start = time.perf_counter()
+        index.search(query, k=k, channel=CHANNELS[i % len(CHANNELS)])
+        latencies.append((time.perf_counter() - start) * 1000)
+    return np.percentile(latencies, 50), np.percentile(latencies, 95)
+
+
+def bench_faiss(rows, queries, dim: int, k: int):
+    tracemalloc.start()
+    start = time.perf_counter()
+    index = FaissKnowledgeIndex(dim)
+    index.load(rows)
+    load_ms = (time.perf_counter() - start) * 1000
+    _, python_peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    p50, p95 = time_queries(index, queries, k)
+    memory_mb = (index.memory_bytes() + python_peak) / 1024 / 1024
+    return load_ms, p50, p95, memory_mb
+
+
+def bench_pgvector(client, rows, queries, k: int, chunk_size: int = 1000):
+    # 합성 행 삽입
+    for offset in range(0, len(rows), chunk_size):
+        client.table(BENCHMARK_TABLE).insert([
+            {
+                "pattern_embedding": encode_vector(row["pattern_embedding"]),
+                "channel_name": row["channel_name"],
+                "diagnosis_text": row["diagnosis_text"],
+                "severity": row["severity"],
+                "condition_type": row["condition_type"],
+                "variant": offset + i,  # (condition_type, variant) 유니크 제약
+                "pattern_stats": row["pattern_stats"],
+                "model_version": BENCHMARK_CONDITION
+            }
+            for i, row in enumerate(rows[offset:offset + chunk_size])
+        ]).execute()
+
+    try:
+        index = PgVectorKnowledgeIndex(client, function_name=BENCHMARK_FUNCTION)
+        tracemalloc.start()
+        p50, p95 = time_queries(index, queries, k)
+        _, python_peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        return 0.0, p50, p95, python_peak / 1024 / 1024
+    finally:
+        client.table(BENCHMARK_TABLE).delete().eq('condition_type', BENCHMARK_CONDITION).execute()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="RAG retrieval backend benchmark")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--dim", type=int, default=256)
+    parser.add_argument("--pgvector", action="store_true", help="pgvector 백엔드도 측정 (벤치마크 전용 테이블에 합성 행 삽입)")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    queries = rng.standard_normal((args.queries, args.dim)).astype(np.float32)
+
+    client = None
+    if args.pgvector:
+        from app.utils.db_client import get_supabase_client
+        client = get_supabase_client()
+
+    print(f"{'backend':<10}{'size':>10}{'load(ms)':>12}{'p50(ms)':>10}{'p95(ms)':>10}{'mem(MB)':>10}")
+    for size in args.sizes:
+        rows = make_rows(size, args.dim, rng)
+
+        results = [("faiss", bench_faiss(rows, queries, args.dim, args.k))]
+        if client is not None:
+            results.append(("pgvector", bench_pgvector(client, rows, queries, args.k)))
+
+        for name, (load_ms, p50, p95, memory_mb) in results:
+            print(f"{name:<10}{size:>10}{load_ms:>12.1f}{p50:>10.3f}{p95:>10.3f}{memory_mb:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
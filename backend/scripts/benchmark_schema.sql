@@ -0,0 +1,38 @@
+-- 검색 벤치마크용 임시 테이블/함수 (scripts/benchmark_retrieval.py --pgvector)
+-- 실서비스 diagnosis_knowledge와 분리해 벤치마크 중 합성 행이 검색에 섞이지 않도록 함
+-- (LIKE ... INCLUDING ALL로 ivfflat 인덱스도 복사되므로 크기별 측정 전 REINDEX TABLE diagnosis_knowledge_benchmark 권장)
+
+CREATE TABLE IF NOT EXISTS diagnosis_knowledge_benchmark (LIKE diagnosis_knowledge INCLUDING ALL);
+
+CREATE OR REPLACE FUNCTION match_diagnosis_knowledge_benchmark(
+    query_embedding VECTOR(256),
+    match_count INTEGER DEFAULT 5,
+    filter_channel VARCHAR DEFAULT NULL,
+    filter_model_version VARCHAR DEFAULT NULL
+)
+RETURNS TABLE (
+    id UUID,
+    channel_name VARCHAR,
+    diagnosis_text TEXT,
+    severity VARCHAR,
+    condition_type VARCHAR,
+    pattern_stats JSONB,
+    similarity FLOAT
+)
+LANGUAGE sql STABLE
+SET ivfflat.probes = 10
+AS $$
+    SELECT
+        dk.id,
+        dk.channel_name,
+        dk.diagnosis_text,
+        dk.severity,
+        dk.condition_type,
+        dk.pattern_stats,
+        1 - (dk.pattern_embedding <=> query_embedding) AS similarity
+    FROM diagnosis_knowledge_benchmark dk
+    WHERE (filter_channel IS NULL OR dk.channel_name = filter_channel)
+      AND (filter_model_version IS NULL OR dk.model_version = filter_model_version)
+    ORDER BY dk.pattern_embedding <=> query_embedding
+    LIMIT match_count;
+$$;
@@ -9,6 +9,7 @@ CREATE TABLE IF NOT EXISTS sensor_data (
     row_count INTEGER,
     channel_count INTEGER,
     raw_data JSONB,
+    gait_features JSONB, -- 주파수 대역/케이던스/보폭 대칭성 특징
     user_id VARCHAR(255),
     status VARCHAR(50) DEFAULT 'uploaded'
 );
@@ -20,6 +21,7 @@ CREATE TABLE IF NOT EXISTS embeddings (
     channel_name VARCHAR(50) NOT NULL,
     embedding vector(256),
     pooling_method VARCHAR(20) DEFAULT 'mean',
+    model_version VARCHAR(150), -- 임베딩 버전 (모델:풀링), 예: amazon/chronos-bolt-tiny:mean
     mean_value FLOAT,
     variance FLOAT,
     peak_value FLOAT,
@@ -42,6 +44,8 @@ CREATE TABLE IF NOT EXISTS diagnosis_knowledge (
     diagnosis_text TEXT, -- 영어 진단 내용 (예: "He is limping to the left")
     severity VARCHAR(20), -- normal, warning, critical
     condition_type VARCHAR(100), -- limp, tremor, imbalance, etc.
+    variant INTEGER DEFAULT 0, -- 같은 condition_type의 합성 변형 번호
+    model_version VARCHAR(150), -- 임베딩 버전 (모델:풀링)
     
     -- 패턴 특성 (이 진단이 적용되는 조건)
     pattern_stats JSONB, -- {"mean": [min, max], "variance": [min, max], ...}
@@ -81,6 +85,7 @@ CREATE TABLE IF NOT EXISTS diagnosis (
     -- 진단에 사용된 정보
     used_embeddings JSONB,
     system_prompt TEXT,
+    diagnosis_path VARCHAR(20) DEFAULT 'llm', -- llm | fast_path (LLM 없이 템플릿 진단)
     
     created_at TIMESTAMP DEFAULT NOW()
 );
@@ -97,8 +102,108 @@ CREATE TABLE IF NOT EXISTS chat_log (
 );
 
 -- 추가 인덱스들
-CREATE INDEX IF NOT EXISTS idx_diagnosis_knowledge_vector ON diagnosis_knowledge USING ivfflat (pattern_embedding vector_cosine_ops);
+-- ivfflat는 생성 시점의 데이터로 클러스터를 만드므로 지식베이스 시딩 후 재구성 필요:
+--   REINDEX INDEX idx_diagnosis_knowledge_vector;
+CREATE INDEX IF NOT EXISTS idx_diagnosis_knowledge_vector ON diagnosis_knowledge USING ivfflat (pattern_embedding vector_cosine_ops) WITH (lists = 100);
 CREATE INDEX IF NOT EXISTS idx_diagnosis_user ON diagnosis(user_id);
 CREATE INDEX IF NOT EXISTS idx_chat_diagnosis ON chat_log(diagnosis_id);
 CREATE INDEX IF NOT EXISTS idx_diagnosis_knowledge_channel ON diagnosis_knowledge(channel_name);
-CREATE INDEX IF NOT EXISTS idx_diagnosis_knowledge_condition ON diagnosis_knowledge(condition_type);
\ No newline at end of file
+CREATE INDEX IF NOT EXISTS idx_diagnosis_knowledge_condition ON diagnosis_knowledge(condition_type);
+
+-- 기존 DB 마이그레이션 및 시더 upsert(on_conflict=condition_type,variant)용 유니크 제약
+ALTER TABLE diagnosis_knowledge ADD COLUMN IF NOT EXISTS variant INTEGER DEFAULT 0;
+ALTER TABLE sensor_data ADD COLUMN IF NOT EXISTS gait_features JSONB;
+ALTER TABLE diagnosis ADD COLUMN IF NOT EXISTS diagnosis_path VARCHAR(20) DEFAULT 'llm';
+-- 기존 행은 model_version NULL로 두고, 실제 배포된 모델로 태그: python -m app.services.reembedding_job --tag-legacy
+ALTER TABLE embeddings ADD COLUMN IF NOT EXISTS model_version VARCHAR(150);
+ALTER TABLE diagnosis_knowledge ADD COLUMN IF NOT EXISTS model_version VARCHAR(150);
+DROP INDEX IF EXISTS uq_diagnosis_knowledge_condition_variant;
+CREATE UNIQUE INDEX IF NOT EXISTS uq_diagnosis_knowledge_condition_variant_version ON diagnosis_knowledge(condition_type, variant, model_version);
+CREATE INDEX IF NOT EXISTS idx_embeddings_sensor_version ON embeddings(sensor_data_id, model_version);
+-- 재임베딩 upsert(on_conflict=sensor_data_id,channel_name,model_version)용 유니크 제약 (기존 중복 행은 하나만 남김)
+DELETE FROM embeddings a USING embeddings b
+WHERE a.sensor_data_id = b.sensor_data_id
+  AND a.channel_name = b.channel_name
+  AND a.model_version = b.model_version
+  AND a.id > b.id;
+CREATE UNIQUE INDEX IF NOT EXISTS uq_embeddings_sensor_channel_version ON embeddings(sensor_data_id, channel_name, model_version);
+CREATE INDEX IF NOT EXISTS idx_sensor_data_upload_keyset ON sensor_data(upload_time DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_sensor_data_status_keyset ON sensor_data(status, upload_time DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_sensor_data_user_keyset ON sensor_data(user_id, upload_time DESC, id DESC);
+
+-- 7. pgvector 기반 진단 패턴 검색 (RETRIEVAL_BACKEND=pgvector)
+-- 코사인 유사도(1 - 코사인 거리) 기준 상위 match_count개, filter_channel 지정 시 해당 축만 검색
+-- 채널/버전 필터는 ivfflat 스캔 이후 적용되므로 기본 probes=1이면 상위 k개보다 적게 반환될 수 있어
+-- 함수 실행 시 probes를 높여 탐색 리스트 수를 늘림 (lists=100 기준 약 10%)
+DROP FUNCTION IF EXISTS match_diagnosis_knowledge(VECTOR, INTEGER, VARCHAR);
+CREATE OR REPLACE FUNCTION match_diagnosis_knowledge(
+    query_embedding VECTOR(256),
+    match_count INTEGER DEFAULT 5,
+    filter_channel VARCHAR DEFAULT NULL,
+    filter_model_version VARCHAR DEFAULT NULL
+)
+RETURNS TABLE (
+    id UUID,
+    channel_name VARCHAR,
+    diagnosis_text TEXT,
+    severity VARCHAR,
+    condition_type VARCHAR,
+    pattern_stats JSONB,
+    similarity FLOAT
+)
+LANGUAGE sql STABLE
+SET ivfflat.probes = 10
+AS $$
+    SELECT
+        dk.id,
+        dk.channel_name,
+        dk.diagnosis_text,
+        dk.severity,
+        dk.condition_type,
+        dk.pattern_stats,
+        1 - (dk.pattern_embedding <=> query_embedding) AS similarity
+    FROM diagnosis_knowledge dk
+    WHERE (filter_channel IS NULL OR dk.channel_name = filter_channel)
+      AND (filter_model_version IS NULL OR dk.model_version = filter_model_version)
+    ORDER BY dk.pattern_embedding <=> query_embedding
+    LIMIT match_count;
+$$;
+
+
+-- 8. 임베딩 버전 관리 (재임베딩 작업 상태 및 검색에 사용할 활성 버전)
+CREATE TABLE IF NOT EXISTS embedding_versions (
+    version VARCHAR(150) PRIMARY KEY, -- 모델:풀링
+    status VARCHAR(20) DEFAULT 'building', -- building, ready, active, retired
+    created_at TIMESTAMP DEFAULT NOW(),
+    activated_at TIMESTAMP
+);
+
+-- 활성 버전 원자적 전환 (한 트랜잭션에서 기존 active -> retired, 대상 -> active)
+CREATE OR REPLACE FUNCTION activate_embedding_version(target_version VARCHAR)
+RETURNS VOID
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    IF NOT EXISTS (SELECT 1 FROM embedding_versions WHERE version = target_version AND status IN ('ready', 'active')) THEN
+        RAISE EXCEPTION 'Embedding version % is not ready', target_version;
+    END IF;
+    UPDATE embedding_versions SET status = 'retired' WHERE status = 'active' AND version <> target_version;
+    UPDATE embedding_versions SET status = 'active', activated_at = NOW() WHERE version = target_version;
+END;
+$$;
+
+-- 버전 태그가 없는(또는 from_version으로 잘못 태그된) 기존 행을 실제 배포 모델 버전으로 태그
+-- 활성 버전이 없으면 대상 버전을 활성화
+CREATE OR REPLACE FUNCTION tag_legacy_embedding_version(target_version VARCHAR, from_version VARCHAR DEFAULT NULL)
+RETURNS VOID
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    UPDATE embeddings SET model_version = target_version WHERE model_version IS NOT DISTINCT FROM from_version;
+    UPDATE diagnosis_knowledge SET model_version = target_version WHERE model_version IS NOT DISTINCT FROM from_version;
+    INSERT INTO embedding_versions (version, status) VALUES (target_version, 'ready') ON CONFLICT (version) DO NOTHING;
+    IF NOT EXISTS (SELECT 1 FROM embedding_versions WHERE status = 'active') THEN
+        UPDATE embedding_versions SET status = 'active', activated_at = NOW() WHERE version = target_version;
+    END IF;
+END;
+$$;